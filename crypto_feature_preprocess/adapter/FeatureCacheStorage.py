@@ -0,0 +1,108 @@
+## Feature cache storage
+import numpy as np
+import os
+import tempfile
+from typing import Optional
+from ..logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class FeatureCacheStorage:
+    """Content addressed on-disk cache of feature matrices
+    Each entry is a memory-mappable .npy file named by its key,
+    least recently used entries are evicted when the cache exceeds max_size_bytes
+    """
+
+    FILE_SUFFIX: str = ".npy"
+
+    def __init__(self, cache_folder: str, max_size_bytes: int) -> None:
+        self.cache_folder = cache_folder
+        self.max_size_bytes = max_size_bytes
+        # Create cache folder if not exist
+        if not os.path.exists(self.cache_folder):
+            os.makedirs(self.cache_folder)
+        pass
+
+    def _get_filepath(self, key: str) -> str:
+        return os.path.join(self.cache_folder, f"{key}{self.FILE_SUFFIX}")
+
+    def load(self, key: str, mmap: bool = True) -> Optional[np.ndarray]:
+        """Load feature matrix of the key
+
+        Args:
+            key (str): cache key
+            mmap (bool, optional): memory-map the file instead of reading it. Defaults to True.
+
+        Returns:
+            Optional[np.ndarray]: feature matrix, None if it is not cached
+        """
+        filepath = self._get_filepath(key)
+        try:
+            feature_data = np.load(filepath, mmap_mode="r" if mmap else None)
+        except FileNotFoundError:
+            return None
+        # Mark as recently used
+        try:
+            os.utime(filepath)
+        except FileNotFoundError:
+            pass
+        logger.debug(f"Feature cache hit: {key}")
+        return feature_data
+
+    def save(self, key: str, feature_data: np.ndarray) -> None:
+        """Save feature matrix of the key, then evict least recently used entries
+
+        Args:
+            key (str): cache key
+            feature_data (np.ndarray): feature matrix
+        """
+        # Write to a temporary file then rename, readers never see a partial file
+        fd, temp_filepath = tempfile.mkstemp(
+            dir=self.cache_folder, suffix=f"{self.FILE_SUFFIX}.tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, feature_data)
+            os.replace(temp_filepath, self._get_filepath(key))
+        except BaseException:
+            os.remove(temp_filepath)
+            raise
+        self.evict(keep_key=key)
+
+    def evict(self, keep_key: Optional[str] = None) -> None:
+        """Remove least recently used entries until the cache fits max_size_bytes
+
+        Args:
+            keep_key (Optional[str], optional): never evict this entry. Defaults to None.
+        """
+        entries = []
+        for filename in os.listdir(self.cache_folder):
+            if not filename.endswith(self.FILE_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_folder, filename))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, filename))
+        total_size = sum(size for _, size, _ in entries)
+        keep_filename = None if keep_key is None else f"{keep_key}{self.FILE_SUFFIX}"
+        for _, size, filename in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            if filename == keep_filename:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_folder, filename))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            logger.debug(f"Feature cache evicted: {filename}")
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(
+            os.path.getsize(os.path.join(self.cache_folder, f))
+            for f in os.listdir(self.cache_folder)
+            if f.endswith(self.FILE_SUFFIX)
+        )
@@ -1,7 +1,10 @@
 ## Training Data storage
 import pandas as pd
 import os
+import queue
+import threading
 from contextlib import ContextDecorator
+from typing import Optional
 from ..logging import get_logger
 
 logger = get_logger(__name__)
@@ -9,7 +12,11 @@ logger = get_logger(__name__)
 
 class TrainingDataStorage(ContextDecorator):
     def __init__(
-        self, buffer_size: int, datafile_prefix: str, output_folder: str
+        self,
+        buffer_size: int,
+        datafile_prefix: str,
+        output_folder: str,
+        write_queue_size: int = 0,
     ) -> None:
         self.buffer_size = buffer_size
         self.datafile_prefix = datafile_prefix
@@ -20,6 +27,14 @@ class TrainingDataStorage(ContextDecorator):
         if not os.path.exists(self.output_folder):
             os.makedirs(self.output_folder)
         self._written_rows: int = 0
+        # Background writer, save_buffer blocks when write_queue_size buffers are queued
+        self._write_queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        self._write_error: Optional[BaseException] = None
+        if write_queue_size > 0:
+            self._write_queue = queue.Queue(maxsize=write_queue_size)
+            self._writer = threading.Thread(target=self._write_worker, daemon=True)
+            self._writer.start()
         pass
 
     def save_data(self, data: pd.DataFrame) -> None:
@@ -39,13 +54,38 @@ class TrainingDataStorage(ContextDecorator):
         # Save buffer to file
         filename = f"{self.datafile_prefix}_{self.buffer_save_counter}.parquet"
         filepath = os.path.join(self.output_folder, filename)
-        self.buffer.to_parquet(filepath)
-        self._written_rows += len(self.buffer)
+        if self._write_queue is None:
+            self._write_buffer(filepath, self.buffer)
+        else:
+            self._raise_write_error()
+            self._write_queue.put((filepath, self.buffer))
         self.buffer_save_counter += 1
         # Clear buffer
         self.buffer = pd.DataFrame()
         pass
 
+    def _write_buffer(self, filepath: str, buffer: pd.DataFrame) -> None:
+        buffer.to_parquet(filepath)
+        self._written_rows += len(buffer)
+
+    def _write_worker(self) -> None:
+        # Write queued buffers in order until None is queued
+        while True:
+            item = self._write_queue.get()
+            try:
+                if item is None:
+                    return
+                if self._write_error is None:
+                    self._write_buffer(*item)
+            except BaseException as e:
+                self._write_error = e
+            finally:
+                self._write_queue.task_done()
+
+    def _raise_write_error(self) -> None:
+        if self._write_error is not None:
+            raise self._write_error
+
     def save_remaining_data(self) -> None:
         # Save remaining buffer to file
         if len(self.buffer) > 0:
@@ -53,14 +93,27 @@ class TrainingDataStorage(ContextDecorator):
             pass
         pass
 
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            # Stop background writer
+            if self._writer is not None:
+                self._write_queue.put(None)
+                self._writer.join()
+                self._writer = None
+                self._write_queue = None
+
     def __enter__(self):
         return self
 
     def __exit__(self, *exc):
-        self.flush()
-        logger.info(
-            f"Training data storage closed in {self.output_folder}, total written: {self.written_rows}"
-        )
+        try:
+            self.close()
+        finally:
+            logger.info(
+                f"Training data storage closed in {self.output_folder}, total written: {self.written_rows}"
+            )
         return False
 
     @property
@@ -69,4 +122,8 @@ class TrainingDataStorage(ContextDecorator):
 
     def flush(self) -> None:
         self.save_remaining_data()
+        # Wait for the queued buffers written
+        if self._write_queue is not None:
+            self._write_queue.join()
+            self._raise_write_error()
         pass
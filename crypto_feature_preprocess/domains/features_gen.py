@@ -1,10 +1,21 @@
 from __future__ import annotations
 from abc import ABCMeta, abstractmethod
+import copy
+from dataclasses import dataclass
 import numpy as np
+from numpy.typing import DTypeLike
+from typing import Any, Callable, Optional, Union
 from .indicators import (
+    Indicator_Backend,
+    Indicator_Cache,
+    calculate_with_cache,
+    calculate_cross_over,
     calculate_log_price_change,
-    calculate_simple_moving_average,
-    calculate_rsi,
+    calculate_log_price_change_array,
+    calculate_prefix_sum,
+    calculate_simple_moving_average_bank,
+    calculate_up_down_move_array,
+    calculate_rsi_bank,
 )
 import pandas as pd
 
@@ -13,93 +24,534 @@ from cryptomarketdata.logging import get_logger
 logger = get_logger(__name__)
 
 
+def price_tail(
+    df_price: Union[pd.Series, np.ndarray], length: int
+) -> Union[pd.Series, np.ndarray]:
+    """latest rows of the price, along the last axis of numpy array
+
+    Args:
+        df_price (Union[pd.Series, np.ndarray]): price series
+        length (int): number of latest rows
+
+    Returns:
+        Union[pd.Series, np.ndarray]: latest rows of the price, without copy
+    """
+    start = max(np.shape(df_price)[-1] - length, 0)
+    if isinstance(df_price, pd.Series):
+        return df_price.iloc[start:]
+    return df_price[..., start:]
+
+
+def validate_feature_dtype(dtype: DTypeLike) -> np.dtype:
+    """validate dtype of the feature array, only floating point is supported
+
+    Args:
+        dtype (DTypeLike): dtype of the feature array e.g. np.float32
+
+    Returns:
+        np.dtype: dtype of the feature array
+    """
+    dtype = np.dtype(dtype)
+    if not np.issubdtype(dtype, np.floating):
+        raise ValueError(f"Not supporting feature dtype: {dtype}")
+    return dtype
+
+
+def get_timeframe_timedelta(timeframe: str) -> pd.Timedelta:
+    """fixed length of the timeframe
+
+    Args:
+        timeframe (str): timeframe e.g. 15Min, 1H, 4H, D
+
+    Returns:
+        pd.Timedelta: length of the timeframe
+    """
+    try:
+        return pd.Timedelta(pd.tseries.frequencies.to_offset(timeframe))
+    except ValueError:
+        raise ValueError(f"Not supporting timeframe of variable length: {timeframe}")
+
+
+def resample_price_pyramid(
+    df_price: pd.Series, base_timeframe: str, timeframes: list[str]
+) -> dict[str, pd.Series]:
+    """Resample price of base timeframe to coarser timeframes, each level is resampled
+        from the coarsest lower level dividing it instead of from the base price.
+        Bucket is aligned to epoch, the close of a bucket is indexed by the time of its
+        last base row i.e. when the close is known, and the incomplete last bucket
+        is dropped, so the resampled price has no look-ahead on the base time index.
+
+    Args:
+        df_price (pd.Series): price of base timeframe, indexed by candle open time
+        base_timeframe (str): timeframe of df_price e.g. 15Min
+        timeframes (list[str]): timeframes to resample e.g. [1H, 4H]
+
+    Returns:
+        dict[str, pd.Series]: close price of each timeframe, base timeframe is df_price
+    """
+    base_timedelta = get_timeframe_timedelta(base_timeframe)
+    data_end_time = df_price.index[-1] + base_timedelta if len(df_price) > 0 else None
+    # levels from fine to coarse, level is (timedelta, close by bucket start, known time)
+    known_time = df_price.index.to_series(index=df_price.index)
+    levels: list[tuple[pd.Timedelta, pd.Series, pd.Series]] = [
+        (base_timedelta, df_price, known_time)
+    ]
+    price_pyramid: dict[str, pd.Series] = {}
+    for timeframe in sorted(set(timeframes), key=get_timeframe_timedelta):
+        level_timedelta = get_timeframe_timedelta(timeframe)
+        if level_timedelta % base_timedelta != pd.Timedelta(0):
+            raise ValueError(
+                f"Timeframe {timeframe} is not a multiple of base timeframe {base_timeframe}"
+            )
+        if level_timedelta == base_timedelta:
+            price_pyramid[timeframe] = df_price
+            continue
+        # resample incrementally from the coarsest level dividing this timeframe
+        _, source_close, source_known_time = [
+            level for level in levels if level_timedelta % level[0] == pd.Timedelta(0)
+        ][-1]
+        resample_kwargs: dict[str, Any] = dict(
+            rule=level_timedelta, closed="left", label="left", origin="epoch"
+        )
+        close = source_close.resample(**resample_kwargs).last()
+        known_time = source_known_time.resample(**resample_kwargs).last()
+        # bucket without data
+        is_valid = known_time.notna()
+        close, known_time = close[is_valid], known_time[is_valid]
+        # last bucket is incomplete if the data ends before the end of the bucket
+        if len(close) > 0 and close.index[-1] + level_timedelta > data_end_time:
+            close, known_time = close.iloc[:-1], known_time.iloc[:-1]
+        levels.append((level_timedelta, close, known_time))
+        price_pyramid[timeframe] = pd.Series(
+            close.to_numpy(),
+            index=pd.DatetimeIndex(known_time.to_numpy()),
+            name=df_price.name,
+        )
+    return price_pyramid
+
+
+@dataclass
+class Packed_Event_Feature:
+    """bit-packed event signal of a lagged event feature
+        the dense feature repeats each event flag dimension times across the
+        look back window, this keeps the event signal only with 1 bit per time step
+    """
+
+    packed_events: np.ndarray  # np.packbits of the event signal along the last axis
+    length: int  # number of time steps of the event signal
+    dimension: int  # look back period of the dense feature
+
+    @staticmethod
+    def pack(events: np.ndarray, dimension: int) -> Packed_Event_Feature:
+        """pack boolean event signal, time along the last axis
+
+        Args:
+            events (np.ndarray): boolean event signal
+            dimension (int): look back period of the dense feature
+
+        Returns:
+            Packed_Event_Feature: packed event feature
+        """
+        events = np.asarray(events, dtype=bool)
+        return Packed_Event_Feature(
+            packed_events=np.packbits(events, axis=-1),
+            length=events.shape[-1],
+            dimension=dimension,
+        )
+
+    @property
+    def shape(self) -> tuple:
+        """shape of the dense feature array
+
+        Returns:
+            tuple: [... x N x dimension]
+        """
+        return self.packed_events.shape[:-1] + (
+            max(self.length - self.dimension + 1, 0),
+            self.dimension,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.packed_events.nbytes
+
+    def unpack_events(self) -> np.ndarray:
+        """boolean event signal
+
+        Returns:
+            np.ndarray: boolean event signal
+        """
+        return np.unpackbits(self.packed_events, axis=-1, count=self.length).view(bool)
+
+    def event_index(self) -> tuple[np.ndarray, ...]:
+        """sparse form, time step of each event along the last axis
+
+        Returns:
+            tuple[np.ndarray, ...]: index of events as np.nonzero
+        """
+        return np.nonzero(self.unpack_events())
+
+    def to_dense(self, dtype: DTypeLike = np.float64) -> np.ndarray:
+        """expand to the dense feature array
+            each row represents (T, T-1, T-2, ..., T-dimensional+1)
+
+        Args:
+            dtype (DTypeLike, optional): floating dtype of the feature array. Defaults to np.float64.
+
+        Returns:
+            np.ndarray: [... x N x dimension] feature array
+        """
+        dtype = validate_feature_dtype(dtype)
+        events = self.unpack_events().astype(dtype)
+        if self.length < self.dimension:
+            return np.zeros(self.shape, dtype=dtype)
+        return np.lib.stride_tricks.sliding_window_view(
+            events, self.dimension, axis=-1
+        )[..., ::-1].copy()
+
+
 class Feature(metaclass=ABCMeta):
     """feature class"""
 
+    indicator_cache: Optional[Indicator_Cache] = None
+    backend: Indicator_Backend = Indicator_Backend.PANDAS
+
+    @property
+    def price_array(self) -> np.ndarray:
+        """price as numpy array, df_price can be pd.Series or np.ndarray
+
+        Returns:
+            np.ndarray: price array
+        """
+        return np.asarray(self.df_price, dtype=np.float64)
+
+    def bind(
+        self,
+        df_price: Union[pd.Series, np.ndarray],
+        indicator_cache: Optional[Indicator_Cache] = None,
+        backend: Optional[Indicator_Backend] = None,
+    ) -> Feature:
+        """shallow copy of the feature over another price series, same parameters
+
+        Args:
+            df_price (Union[pd.Series, np.ndarray]): price series
+            indicator_cache (Optional[Indicator_Cache], optional): share indicators with other features. Defaults to None.
+            backend (Optional[Indicator_Backend], optional): indicator backend, None to keep it. Defaults to None.
+
+        Returns:
+            Feature: feature of df_price
+        """
+        feature = copy.copy(self)
+        feature.df_price = df_price
+        feature.indicator_cache = indicator_cache
+        if backend is not None:
+            feature.backend = Indicator_Backend(backend)
+        return feature
+
+    @property
+    def indicators(self) -> list[tuple]:
+        """indicators the feature calculates, same keys as the indicator cache
+
+        Returns:
+            list[tuple]: list of (indicator name, params)
+        """
+        return []
+
+    @property
+    def warm_up_length(self) -> int:
+        """number of leading price rows without a feature row
+
+        Returns:
+            int: warm-up length
+        """
+        return self.invalid_data_length + self.dimension - 1
+
+    @property
+    def look_behind_length(self) -> int:
+        """number of price rows before the first feature row its calculation reads
+
+        Returns:
+            int: look behind length
+        """
+        return self.warm_up_length
+
+    def _get_indicator(
+        self, indicator: str, params: tuple, calculate: Callable[[], Any]
+    ) -> Any:
+        """get indicator of df_price, shared through indicator cache if it is given
+
+        Args:
+            indicator (str): indicator name
+            params (tuple): parameters of the indicator
+            calculate (Callable[[], Any]): calculate the indicator
+
+        Returns:
+            Any: indicator
+        """
+        return calculate_with_cache(
+            indicator_cache=self.indicator_cache,
+            df_price=self.df_price,
+            indicator=indicator,
+            params=params,
+            calculate=calculate,
+        )
+
     @abstractmethod
-    def output_feature_array(self, normalize: bool = False) -> np.ndarray:
+    def output_feature_array(
+        self,
+        normalize: bool = False,
+        as_view: bool = False,
+        dtype: DTypeLike = np.float64,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
         """output array
 
+        Args:
+            normalize (bool, optional): Normalize the value. Defaults to False.
+            as_view (bool, optional): output read-only view over the raw feature. Defaults to False.
+            dtype (DTypeLike, optional): floating dtype of the feature array. Defaults to np.float64.
+            out (Optional[np.ndarray], optional): write the latest len(out) rows into this
+                [rows x dimension] array instead of allocating, dtype follows out. Defaults to None.
+
         Returns:
             np.ndarray: array
         """
         pass
 
     def create_feature_from_raw_data_array(
-        self, raw_data_array: np.ndarray, look_back: int
+        self,
+        raw_data_array: np.ndarray,
+        look_back: int,
+        as_view: bool = False,
+        dtype: DTypeLike = np.float64,
+        out: Optional[np.ndarray] = None,
     ) -> np.ndarray:
         """create feature from raw array with lookback
+            each row represents (T, T-1, T-2, ..., T-look_back+1)
+            leading axes of raw_data_array e.g. scenarios are kept, time is the last axis
 
         Args:
             raw_data_array (np.ndarray): raw array
             look_back (int): dimension of the feature, i.e. look back period
+            as_view (bool, optional): return a read-only sliding window view over
+                raw_data_array instead of a copy, i.e. O(N) memory. Defaults to False.
+            dtype (DTypeLike, optional): floating dtype of the feature array. Defaults to np.float64.
+            out (Optional[np.ndarray], optional): write the latest len(out) rows into this
+                [rows x dimension] array instead of allocating, dtype follows out. Defaults to None.
 
         Returns:
             np.ndarray: feature array
         """
+        dtype = validate_feature_dtype(dtype if out is None else out.dtype)
+        # Cast the raw array before windowing, it is O(N) instead of O(N x look_back)
+        raw_data_array = np.asarray(raw_data_array, dtype=dtype)
+        if raw_data_array.shape[-1] < look_back:
+            feature_view = np.zeros(
+                raw_data_array.shape[:-1] + (0, look_back), dtype=dtype
+            )
+        else:
+            # Sliding window of (N-look_back+1) x (look_back), reversed to have latest value first
+            feature_view = np.lib.stride_tricks.sliding_window_view(
+                raw_data_array, look_back, axis=-1
+            )[..., ::-1]
+        if out is not None:
+            rows = out.shape[-2] if out.ndim >= 2 else -1
+            if (
+                out.shape[:-2] != feature_view.shape[:-2]
+                or out.shape[-1:] != (look_back,)
+                or not 0 <= rows <= feature_view.shape[-2]
+            ):
+                raise ValueError(
+                    f"Output shape {out.shape} does not fit feature shape {feature_view.shape}"
+                )
+            # write the latest rows straight into the output buffer
+            np.copyto(out, feature_view[..., feature_view.shape[-2] - rows :, :])
+            return out
+        if as_view:
+            return feature_view
         # Constract feature array of (N-look_back+1) x (look_back)
-        feature_array = np.zeros((len(raw_data_array) - look_back + 1, look_back))
-
-        for i in range(look_back):
-            feature_array[:, look_back - 1 - i] = raw_data_array[
-                i : i + len(raw_data_array) - look_back + 1
-            ]
-        return feature_array
+        return np.array(feature_view, dtype=dtype)
 
     def feature_length(self, raw_data_length: int, look_back: int) -> tuple:
         return raw_data_length - look_back + 1
 
+    def output_raw_feature(self, normalize: bool = False) -> np.ndarray:
+        """raw feature before windowing, time along the last axis,
+            output_feature_array windows it over the look back period
+
+        Args:
+            normalize (bool, optional): Normalize the value. Defaults to False.
+
+        Returns:
+            np.ndarray: raw feature
+        """
+        raise NotImplementedError(f"{type(self).__name__} has no raw feature")
+
+    @property
+    def output_length(self) -> int:
+        """number of rows output_feature_array returns for price without nan,
+            the pandas backend drops nan so the feature of price with nan is shorter
+
+        Returns:
+            int: number of rows of the feature array
+        """
+        return max(np.shape(self.df_price)[-1] - self.warm_up_length, 0)
+
+    def tail_length(self, n: int = 1) -> int:
+        """minimal number of latest price rows to calculate the latest n feature rows
+
+        Args:
+            n (int, optional): number of latest feature rows. Defaults to 1.
+
+        Returns:
+            int: number of price rows
+        """
+        return self.look_behind_length + n
+
+    def output_feature_tail(
+        self, n: int = 1, normalize: bool = False, dtype: DTypeLike = np.float64
+    ) -> np.ndarray:
+        """output the latest n rows only, calculated over the minimal price tail
+
+        Args:
+            n (int, optional): number of latest feature rows, 1 for the latest row only. Defaults to 1.
+            normalize (bool, optional): Normalize the value. Defaults to False.
+            dtype (DTypeLike, optional): floating dtype of the feature array. Defaults to np.float64.
+
+        Returns:
+            np.ndarray: [n x dimension] feature array, fewer rows if the price is too short
+        """
+        feature = self.bind(
+            df_price=price_tail(self.df_price, self.tail_length(n)),
+            indicator_cache=None,
+        )
+        # pandas backend drops nan, size the output from the raw feature
+        raw_feature = feature.output_raw_feature(normalize=normalize)
+        feature_length = self.feature_length(raw_feature.shape[-1], self.dimension)
+        out = np.empty(
+            raw_feature.shape[:-1] + (min(n, max(feature_length, 0)), self.dimension),
+            dtype=validate_feature_dtype(dtype),
+        )
+        return self.create_feature_from_raw_data_array(
+            raw_data_array=raw_feature, look_back=self.dimension, out=out
+        )
+
 
 class Log_Price_Feature(Feature):
     """log price feature class"""
 
     def __init__(
-        self, df_price: pd.Series, dimension: int, normalize_value: float = 0.02
+        self,
+        df_price: Union[pd.Series, np.ndarray],
+        dimension: int,
+        normalize_value: float = 0.02,
+        indicator_cache: Optional[Indicator_Cache] = None,
+        backend: Indicator_Backend = Indicator_Backend.PANDAS,
     ):
         """initialize log price feature class
 
         Args:
-            df_price (pd.Series): price series
+            df_price (Union[pd.Series, np.ndarray]): price series
             dimension (int): dimension of the feature, i.e. look back period
             normalize_value(float) : normalize the price change by this value
+            indicator_cache (Optional[Indicator_Cache], optional): share indicators with other features. Defaults to None.
+            backend (Indicator_Backend, optional): NUMPY skips pandas Series in the calculation,
+                df_price can then be np.ndarray, with time along the last axis e.g.
+                [scenario x candle]. Defaults to Indicator_Backend.PANDAS.
         """
         self.df_price = df_price
         self.dimension = dimension
         self.normalized_value: float = normalize_value
+        self.indicator_cache = indicator_cache
+        self.backend = Indicator_Backend(backend)
 
-    def _calculate(self) -> pd.Series:
+    def _calculate(self) -> Union[pd.Series, np.ndarray]:
         """helper function calculate log price change from pandas series
 
         Returns:
-            pd.Series: log price change
+            Union[pd.Series, np.ndarray]: log price change, np.ndarray for NUMPY backend
         """
-        log_price_change = calculate_log_price_change(self.df_price)
+        if self.backend == Indicator_Backend.NUMPY:
+            log_price_change = self._get_indicator(
+                indicator="log_price_change_array",
+                params=(),
+                calculate=lambda: calculate_log_price_change_array(self.price_array),
+            )
+            # slice off warm-up instead of dropping nan
+            return log_price_change[..., self.invalid_data_length :]
+
+        log_price_change = self._get_indicator(
+            indicator="log_price_change",
+            params=(),
+            calculate=lambda: calculate_log_price_change(self.df_price),
+        )
         # drop nan
         log_price_change = log_price_change.dropna()
         return log_price_change
 
-    def output_feature_array(self, normalize: bool = False) -> np.ndarray:
+    def output_feature_array(
+        self,
+        normalize: bool = False,
+        as_view: bool = False,
+        dtype: DTypeLike = np.float64,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
         """output array
             Note: for crossing feature, need to move the feature to left by one candle
 
         Args:
             normalize (bool, optional): Normalize the value. Defaults to False.
+            as_view (bool, optional): output read-only view over the raw feature. Defaults to False.
+            dtype (DTypeLike, optional): floating dtype of the feature array. Defaults to np.float64.
+            out (Optional[np.ndarray], optional): write the latest len(out) rows into this
+                [rows x dimension] array instead of allocating, dtype follows out. Defaults to None.
 
         Returns:
             np.ndarray: _description_
         """
-        log_price_raw: pd.Series = self._calculate()
+        log_price_raw: np.ndarray = self.output_raw_feature(normalize=normalize)
 
         # Constract feature array of (N-dimension) x (dimension)
         log_price_feature_array = self.create_feature_from_raw_data_array(
-            raw_data_array=log_price_raw.values, look_back=self.dimension
+            raw_data_array=log_price_raw,
+            look_back=self.dimension,
+            as_view=as_view,
+            dtype=dtype,
+            out=out,
         )
-        # Normalize value
-        if normalize:
-            log_price_feature_array /= self.normalized_value
 
         return log_price_feature_array
 
+    def output_raw_feature(self, normalize: bool = False) -> np.ndarray:
+        """log price change before windowing
+
+        Args:
+            normalize (bool, optional): Normalize the value. Defaults to False.
+
+        Returns:
+            np.ndarray: log price change
+        """
+        log_price_raw: np.ndarray = np.asarray(self._calculate())
+        # Normalize value before windowing, it is O(N) instead of O(N x dimension)
+        if normalize:
+            log_price_raw = log_price_raw / self.normalized_value
+        return log_price_raw
+
+    @property
+    def indicators(self) -> list[tuple]:
+        if self.backend == Indicator_Backend.NUMPY:
+            return [("log_price_change_array", ())]
+        return [("log_price_change", ())]
+
+    @property
+    def invalid_data_length(self) -> int:
+        """invalid data length
+
+        Returns:
+            int: invalid data length
+        """
+        return 1
+
     @property
     def shape(self) -> tuple:
         """shape of the feature array
@@ -122,20 +574,32 @@ class SMA_Cross_Feature(Feature):
     """
 
     def __init__(
-        self, df_price: pd.Series, sma_window_1: int, sma_window_2: int, dimension: int
+        self,
+        df_price: Union[pd.Series, np.ndarray],
+        sma_window_1: int,
+        sma_window_2: int,
+        dimension: int,
+        indicator_cache: Optional[Indicator_Cache] = None,
+        backend: Indicator_Backend = Indicator_Backend.PANDAS,
     ) -> None:
         """_summary_
 
         Args:
-            df_price (pd.Series): price series
+            df_price (Union[pd.Series, np.ndarray]): price series
             sma_window_1 (int): sma windows length 1
             sma_window_2 (int): sma windows length 2
             dimension (int): dimension of the feature, i.e. look back period
+            indicator_cache (Optional[Indicator_Cache], optional): share indicators with other features. Defaults to None.
+            backend (Indicator_Backend, optional): NUMPY skips pandas Series in the calculation,
+                df_price can then be np.ndarray, with time along the last axis e.g.
+                [scenario x candle]. Defaults to Indicator_Backend.PANDAS.
         """
         self.df_price = df_price
         self.sma_window_1 = sma_window_1
         self.sma_window_2 = sma_window_2
         self.dimension = dimension
+        self.indicator_cache = indicator_cache
+        self.backend = Indicator_Backend(backend)
 
     def _calculate(self) -> np.ndarray:
         """calculate the cross over of two SMA signals
@@ -143,52 +607,123 @@ class SMA_Cross_Feature(Feature):
         Returns:
             np.ndarray: Cross over signals of two SMA
         """
-        sma_1 = calculate_simple_moving_average(self.df_price, self.sma_window_1)
-        sma_2 = calculate_simple_moving_average(self.df_price, self.sma_window_2)
+        sma_1, sma_2 = [
+            self._get_sma(window) for window in (self.sma_window_1, self.sma_window_2)
+        ]
 
         sma_cross = self._cross_over_lineA_above_lineB(sma_1, sma_2)
 
         # Remove invalid from sma_cross
-        sma_cross = sma_cross[self.invalid_data_length :]
+        sma_cross = sma_cross[..., self.invalid_data_length :]
         return sma_cross
 
+    def _get_sma(self, window: int) -> np.ndarray:
+        """simple moving average from the prefix sum shared by all SMA windows
+
+        Args:
+            window (int): sma window
+
+        Returns:
+            np.ndarray: simple moving average
+        """
+        prefix_sum = self._get_indicator(
+            indicator="prefix_sum",
+            params=(),
+            calculate=lambda: calculate_prefix_sum(self.price_array),
+        )
+        return self._get_indicator(
+            indicator="sma",
+            params=(window,),
+            calculate=lambda: calculate_simple_moving_average_bank(
+                self.price_array, windows=[window], prefix_sum=prefix_sum
+            )[0],
+        )
+
     def _cross_over_lineA_above_lineB(
-        self, lineA: pd.Series, lineB: pd.Series
-    ) -> pd.Series:
+        self,
+        lineA: Union[pd.Series, np.ndarray],
+        lineB: Union[pd.Series, np.ndarray],
+    ) -> np.ndarray:
         """calculate the cross over of two lines:
             lineA cross above lineB
-            it output True/False if there is lineA crossing above linB signal
+            it output True/False if there is lineA crossing above linB signal,
+            lines equal within rounding tie as in calculate_cross_over
 
         Args:
-            lineA (pd.Series): pandas Series column with numeric type
-            lineB (pd.Series): pandas Series column with numeric type
+            lineA (Union[pd.Series, np.ndarray]): line with numeric type
+            lineB (Union[pd.Series, np.ndarray]): line with numeric type
 
         Returns:
-            pd.Series: Series of True or False
+            np.ndarray: array of True or False
         """
-        lineA_minus_lineB = lineA - lineB
-        prev_lineA_minus_lineB = lineA_minus_lineB.shift(1)
-
-        _cross_over = np.where(
-            ((lineA_minus_lineB > 0) & (prev_lineA_minus_lineB < 0)), True, False
+        lineA = np.asarray(lineA, dtype=np.float64)
+        lineB = np.asarray(lineB, dtype=np.float64)
+        return calculate_cross_over(
+            lineA - lineB, line_scale=np.maximum(np.abs(lineA), np.abs(lineB))
         )
-        return _cross_over
 
-    def output_feature_array(self, normalize: bool = False) -> np.ndarray:
+    def output_feature_array(
+        self,
+        normalize: bool = False,
+        as_view: bool = False,
+        dtype: DTypeLike = np.float64,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
         """output array
             each feature represents:
             (T, T-1, T-2, ..., T-dimensional+1)
+
+        Args:
+            normalize (bool, optional): not applicable to cross signal. Defaults to False.
+            as_view (bool, optional): output read-only view over the raw feature. Defaults to False.
+            dtype (DTypeLike, optional): floating dtype of the feature array. Defaults to np.float64.
+            out (Optional[np.ndarray], optional): write the latest len(out) rows into this
+                [rows x dimension] array instead of allocating, dtype follows out. Defaults to None.
+
         Returns:
             np.ndarray: array
         """
         # Constract feature array of (N-dimension) x (dimension)
-        sma_cross: np.ndarray = self._calculate()
+        # boolean cross signal is cast to dtype once before windowing
+        sma_cross: np.ndarray = self.output_raw_feature(normalize=normalize)
         sma_cross_feature_array = self.create_feature_from_raw_data_array(
-            raw_data_array=sma_cross, look_back=self.dimension
+            raw_data_array=sma_cross,
+            look_back=self.dimension,
+            as_view=as_view,
+            dtype=dtype,
+            out=out,
         )
 
         return sma_cross_feature_array
 
+    def output_raw_feature(self, normalize: bool = False) -> np.ndarray:
+        """cross signal before windowing
+
+        Args:
+            normalize (bool, optional): not applicable to cross signal. Defaults to False.
+
+        Returns:
+            np.ndarray: boolean cross signal
+        """
+        return self._calculate()
+
+    def output_packed_feature(self) -> Packed_Event_Feature:
+        """output bit-packed cross signal, expand with to_dense only when needed
+            to_dense() is identical to output_feature_array()
+
+        Returns:
+            Packed_Event_Feature: packed cross signal
+        """
+        return Packed_Event_Feature.pack(self._calculate(), dimension=self.dimension)
+
+    @property
+    def indicators(self) -> list[tuple]:
+        return [
+            ("prefix_sum", ()),
+            ("sma", (self.sma_window_1,)),
+            ("sma", (self.sma_window_2,)),
+        ]
+
     @property
     def invalid_data_length(self) -> int:
         """invalid data length
@@ -198,6 +733,16 @@ class SMA_Cross_Feature(Feature):
         """
         return max(self.sma_window_1, self.sma_window_2) - 1
 
+    @property
+    def look_behind_length(self) -> int:
+        """number of price rows before the first feature row its calculation reads,
+            the first cross over needs the SMA difference of the row before
+
+        Returns:
+            int: look behind length
+        """
+        return self.warm_up_length + 1
+
     @property
     def shape(self) -> tuple:
         """shape of the feature array
@@ -222,22 +767,28 @@ class RSI_Feature(Feature):
 
     def __init__(
         self,
-        df_price: pd.Series,
+        df_price: Union[pd.Series, np.ndarray],
         rsi_window: int,
         dimension: int,
         normalize_value: float = 20,
         offset: float = 50,
         is_clip: bool = True,
+        indicator_cache: Optional[Indicator_Cache] = None,
+        backend: Indicator_Backend = Indicator_Backend.PANDAS,
     ) -> None:
         """RSI feature
             rsi feature = (rsi - offset) / normalize_value
         Args:
-            df_price (pd.Series): market price series
+            df_price (Union[pd.Series, np.ndarray]): market price series
             rsi_window (int): rsi window
             dimension (int): dimension of the feature, i.e. look back period
             normalize_value (float, optional): normalize value. Defaults to 25.
             offset (float, optional): offset. Defaults to 50.
             is_clip (bool, optional): clip value between (-1,1) when we run normalization. Defaults to True.
+            indicator_cache (Optional[Indicator_Cache], optional): share indicators with other features. Defaults to None.
+            backend (Indicator_Backend, optional): NUMPY skips pandas Series in the calculation,
+                df_price can then be np.ndarray, with time along the last axis e.g.
+                [scenario x candle]. Defaults to Indicator_Backend.PANDAS.
         """
         self.df_price = df_price
         self.rsi_window = rsi_window
@@ -245,41 +796,119 @@ class RSI_Feature(Feature):
         self.normalized_value: float = normalize_value
         self.offset: float = offset
         self.is_clip: bool = is_clip
+        self.indicator_cache = indicator_cache
+        self.backend = Indicator_Backend(backend)
 
-    def _calculate(self) -> pd.Series:
+    def _calculate(self) -> np.ndarray:
         """calculate the RSI feature
 
         Returns:
-            pd.Series: RSI feature
+            np.ndarray: RSI feature
         """
-        rsi = calculate_rsi(df_price=self.df_price, window=self.rsi_window)
+        up_down_move = None
+        if self.indicator_cache is not None:
+            # share the price move with RSI of other windows
+            up_down_move = self._get_indicator(
+                indicator="up_down_move_array",
+                params=(),
+                calculate=lambda: calculate_up_down_move_array(self.price_array),
+            )
+        rsi = self._get_indicator(
+            indicator="rsi",
+            params=(self.rsi_window,),
+            calculate=lambda: calculate_rsi_bank(
+                self.price_array,
+                windows=[self.rsi_window],
+                up_down_move=up_down_move,
+            )[0],
+        )
+        if self.backend == Indicator_Backend.NUMPY:
+            # slice off warm-up instead of dropping nan
+            return rsi[..., self.invalid_data_length :]
         # drop nan
-        rsi = rsi.dropna()
+        rsi = rsi[~np.isnan(rsi)]
         return rsi
 
-    def output_feature_array(self, normalize: bool = False) -> np.ndarray:
+    def output_feature_array(
+        self,
+        normalize: bool = False,
+        as_view: bool = False,
+        dtype: DTypeLike = np.float64,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
         """output array
 
         Args:
             normalize (bool, optional): Normalize the value. Defaults to False.
+            as_view (bool, optional): output read-only view over the raw feature. Defaults to False.
+            dtype (DTypeLike, optional): floating dtype of the feature array. Defaults to np.float64.
+            out (Optional[np.ndarray], optional): write the latest len(out) rows into this
+                [rows x dimension] array instead of allocating, dtype follows out. Defaults to None.
 
         Returns:
             np.ndarray: array
         """
+        rsi_raw: np.ndarray = self.output_raw_feature(normalize=normalize)
+
         # Constract feature array of (N-dimension) x (dimension)
-        rsi_raw: pd.Series = self._calculate()
         rsi_feature_array = self.create_feature_from_raw_data_array(
-            raw_data_array=rsi_raw.values, look_back=self.dimension
+            raw_data_array=rsi_raw,
+            look_back=self.dimension,
+            as_view=as_view,
+            dtype=dtype,
+            out=out,
         )
-        # Normalize value
+
+        return rsi_feature_array
+
+    def output_raw_feature(self, normalize: bool = False) -> np.ndarray:
+        """RSI before windowing
+
+        Args:
+            normalize (bool, optional): Normalize the value. Defaults to False.
+
+        Returns:
+            np.ndarray: RSI
+        """
+        rsi_raw: np.ndarray = self._calculate()
+        # Normalize value before windowing, it is O(N) instead of O(N x dimension)
         if normalize:
-            rsi_feature_array = (
-                rsi_feature_array - self.offset
-            ) / self.normalized_value
+            rsi_raw = (rsi_raw - self.offset) / self.normalized_value
             if self.is_clip:
-                rsi_feature_array = np.clip(rsi_feature_array, a_min=-1, a_max=1)
+                rsi_raw = np.clip(rsi_raw, a_min=-1, a_max=1)
+        return rsi_raw
 
-        return rsi_feature_array
+    @property
+    def indicators(self) -> list[tuple]:
+        return [("up_down_move_array", ()), ("rsi", (self.rsi_window,))]
+
+    @property
+    def invalid_data_length(self) -> int:
+        """invalid data length
+
+        Returns:
+            int: invalid data length
+        """
+        return self.rsi_window
+
+    def tail_length(self, n: int = 1) -> int:
+        """minimal number of latest price rows to calculate the latest n feature rows
+            the exponential moving average never forgets, so the tail also covers the
+            rows until the weight of the dropped history is below float64 precision
+
+        Args:
+            n (int, optional): number of latest feature rows. Defaults to 1.
+
+        Returns:
+            int: number of price rows
+        """
+        decay = 1.0 - 1.0 / self.rsi_window
+        memory_length = (
+            int(np.ceil(np.log(np.finfo(np.float64).eps) / np.log(decay)))
+            if decay > 0
+            else 0
+        )
+        return super().tail_length(n) + memory_length
 
     @property
     def shape(self) -> tuple:
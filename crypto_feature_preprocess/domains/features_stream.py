@@ -0,0 +1,240 @@
+from __future__ import annotations
+from abc import ABCMeta, abstractmethod
+from collections import deque
+from typing import Optional
+import numpy as np
+from .indicators import calculate_cross_over
+
+from cryptomarketdata.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Running_Sum:
+    """running sum over a fixed window with Kahan compensation
+    keeps rounding error bounded over an unbounded stream
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.values: deque = deque(maxlen=window)
+        self._sum: float = 0.0
+        self._compensation: float = 0.0
+
+    def _add(self, value: float) -> None:
+        y = value - self._compensation
+        t = self._sum + y
+        self._compensation = (t - self._sum) - y
+        self._sum = t
+
+    def update(self, value: float) -> None:
+        if len(self.values) == self.window:
+            self._add(-self.values[0])
+        self.values.append(value)
+        self._add(value)
+
+    @property
+    def is_ready(self) -> bool:
+        return len(self.values) == self.window
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self.window
+
+
+class _Running_Ewm:
+    """running exponential weighted mean
+    same recursion as pandas ewm(com=window - 1, adjust=True)
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.old_wt_factor: float = 1.0 - 1.0 / window
+        self.weighted: Optional[float] = None
+        self.old_wt: float = 1.0
+        self.nobs: int = 0
+
+    def update(self, value: float) -> None:
+        self.nobs += 1
+        if self.weighted is None:
+            self.weighted = value
+            self.old_wt = 1.0
+            return
+        self.old_wt *= self.old_wt_factor
+        # avoid numerical errors on constant series
+        if self.weighted != value:
+            self.weighted = (self.old_wt * self.weighted + value) / (self.old_wt + 1.0)
+        self.old_wt += 1.0
+
+    @property
+    def is_ready(self) -> bool:
+        return self.nobs >= self.window
+
+
+class Streaming_Feature(metaclass=ABCMeta):
+    """streaming feature class
+    keep running state of the indicator and output the latest feature row per candle
+    """
+
+    def __init__(self, dimension: int) -> None:
+        self.dimension = dimension
+        # latest raw feature value at the right end
+        self._raw_history: deque = deque(maxlen=dimension)
+
+    @abstractmethod
+    def _update_raw(self, price: float) -> Optional[float]:
+        """update indicator state with new price
+
+        Args:
+            price (float): new price
+
+        Returns:
+            Optional[float]: raw feature value, None if indicator is still warming up
+        """
+        pass
+
+    def _normalize(self, raw_feature: np.ndarray) -> np.ndarray:
+        return raw_feature
+
+    def update(self, price: float) -> None:
+        """update feature with a new candle
+
+        Args:
+            price (float): new price
+        """
+        raw_value = self._update_raw(float(price))
+        if raw_value is not None:
+            self._raw_history.append(raw_value)
+
+    @property
+    def is_ready(self) -> bool:
+        return len(self._raw_history) == self.dimension
+
+    def output_feature_row(self, normalize: bool = False) -> Optional[np.ndarray]:
+        """output latest feature row
+            each feature represents:
+            (T, T-1, T-2, ..., T-dimensional+1)
+
+        Args:
+            normalize (bool, optional): Normalize the value. Defaults to False.
+
+        Returns:
+            Optional[np.ndarray]: feature row, None if the feature is still warming up
+        """
+        if not self.is_ready:
+            return None
+        feature_row = np.array(self._raw_history, dtype=np.float64)[::-1]
+        if normalize:
+            feature_row = self._normalize(feature_row)
+        return feature_row
+
+
+class Log_Price_Streaming_Feature(Streaming_Feature):
+    """streaming log price feature class"""
+
+    def __init__(self, dimension: int, normalize_value: float = 0.02) -> None:
+        """initialize streaming log price feature class
+
+        Args:
+            dimension (int): dimension of the feature, i.e. look back period
+            normalize_value(float) : normalize the price change by this value
+        """
+        super().__init__(dimension=dimension)
+        self.normalized_value: float = normalize_value
+        self.last_price: Optional[float] = None
+
+    def _update_raw(self, price: float) -> Optional[float]:
+        last_price, self.last_price = self.last_price, price
+        if last_price is None:
+            return None
+        return float(np.log(price / last_price))
+
+    def _normalize(self, raw_feature: np.ndarray) -> np.ndarray:
+        return raw_feature / self.normalized_value
+
+
+class SMA_Cross_Streaming_Feature(Streaming_Feature):
+    """streaming cross of two SMA signals"""
+
+    def __init__(self, sma_window_1: int, sma_window_2: int, dimension: int) -> None:
+        """initialize streaming SMA cross feature
+
+        Args:
+            sma_window_1 (int): sma windows length 1
+            sma_window_2 (int): sma windows length 2
+            dimension (int): dimension of the feature, i.e. look back period
+        """
+        super().__init__(dimension=dimension)
+        self.sma_window_1 = sma_window_1
+        self.sma_window_2 = sma_window_2
+        self._sma_1 = _Running_Sum(window=sma_window_1)
+        self._sma_2 = _Running_Sum(window=sma_window_2)
+        # previous SMA difference and max(|sma_1|, |sma_2|)
+        self._prev_sma_diff: Optional[tuple[float, float]] = None
+
+    def _update_raw(self, price: float) -> Optional[float]:
+        self._sma_1.update(price)
+        self._sma_2.update(price)
+        if not (self._sma_1.is_ready and self._sma_2.is_ready):
+            return None
+        sma_1, sma_2 = self._sma_1.mean, self._sma_2.mean
+        sma_diff = (sma_1 - sma_2, max(abs(sma_1), abs(sma_2)))
+        prev_sma_diff, self._prev_sma_diff = self._prev_sma_diff, sma_diff
+        if prev_sma_diff is None:
+            return 0.0
+        # lineA cross above lineB, with the tie rule of the batch feature
+        cross_over = calculate_cross_over(
+            np.array([prev_sma_diff[0], sma_diff[0]]),
+            line_scale=np.array([prev_sma_diff[1], sma_diff[1]]),
+        )
+        return float(cross_over[-1])
+
+
+class RSI_Streaming_Feature(Streaming_Feature):
+    """streaming RSI feature with Wilder up and down averages"""
+
+    def __init__(
+        self,
+        rsi_window: int,
+        dimension: int,
+        normalize_value: float = 20,
+        offset: float = 50,
+        is_clip: bool = True,
+    ) -> None:
+        """streaming RSI feature
+            rsi feature = (rsi - offset) / normalize_value
+        Args:
+            rsi_window (int): rsi window
+            dimension (int): dimension of the feature, i.e. look back period
+            normalize_value (float, optional): normalize value. Defaults to 20.
+            offset (float, optional): offset. Defaults to 50.
+            is_clip (bool, optional): clip value between (-1,1) when we run normalization. Defaults to True.
+        """
+        super().__init__(dimension=dimension)
+        self.rsi_window = rsi_window
+        self.normalized_value: float = normalize_value
+        self.offset: float = offset
+        self.is_clip: bool = is_clip
+        self.last_price: Optional[float] = None
+        self._ma_up = _Running_Ewm(window=rsi_window)
+        self._ma_down = _Running_Ewm(window=rsi_window)
+
+    def _update_raw(self, price: float) -> Optional[float]:
+        last_price, self.last_price = self.last_price, price
+        if last_price is None:
+            return None
+        delta = price - last_price
+        self._ma_up.update(max(delta, 0.0))
+        self._ma_down.update(-1 * min(delta, 0.0))
+        if not self._ma_up.is_ready:
+            return None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = np.float64(self._ma_up.weighted) / np.float64(self._ma_down.weighted)
+            rsi = 100 - (100 / (1 + rsi))
+        return float(rsi)
+
+    def _normalize(self, raw_feature: np.ndarray) -> np.ndarray:
+        raw_feature = (raw_feature - self.offset) / self.normalized_value
+        if self.is_clip:
+            raw_feature = np.clip(raw_feature, a_min=-1, a_max=1)
+        return raw_feature
@@ -1,7 +1,97 @@
+from __future__ import annotations
+from enum import Enum
+import threading
+from typing import Any, Callable, NamedTuple, Optional, Union
 import pandas as pd
 import numpy as np
 
 
+class Indicator_Backend(str, Enum):
+    PANDAS = "PANDAS"
+    NUMPY = "NUMPY"
+
+
+class Indicator_Cache:
+    """memo of indicators shared by all features in one feature run
+    keyed by (series identity, indicator, params)
+    thread safe, an indicator is calculated once even if features run concurrently
+    """
+
+    def __init__(self) -> None:
+        self._cache: dict[tuple, Any] = {}
+        # keep a reference of the series so that its id is not reused during the run
+        self._series: dict[int, pd.Series] = {}
+        self._lock = threading.Lock()
+        # one lock per indicator, other indicators are calculated in parallel
+        self._key_locks: dict[tuple, threading.Lock] = {}
+
+    def get_or_calculate(
+        self,
+        df_price: pd.Series,
+        indicator: str,
+        params: tuple,
+        calculate: Callable[[], Any],
+    ) -> Any:
+        """get indicator from cache, calculate it if it is not there
+
+        Args:
+            df_price (pd.Series): price series
+            indicator (str): indicator name
+            params (tuple): parameters of the indicator
+            calculate (Callable[[], Any]): calculate the indicator when it is not cached
+
+        Returns:
+            Any: indicator
+        """
+        key = (id(df_price), indicator, params)
+        if key in self._cache:
+            return self._cache[key]
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._cache:
+                value = calculate()
+                with self._lock:
+                    self._series[id(df_price)] = df_price
+                    self._cache[key] = value
+        return self._cache[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._series.clear()
+            self._key_locks.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+def calculate_with_cache(
+    indicator_cache: Optional[Indicator_Cache],
+    df_price: pd.Series,
+    indicator: str,
+    params: tuple,
+    calculate: Callable[[], Any],
+) -> Any:
+    """calculate indicator through the indicator cache if it is given
+
+    Args:
+        indicator_cache (Optional[Indicator_Cache]): indicator cache, None to calculate directly
+        df_price (pd.Series): price series
+        indicator (str): indicator name
+        params (tuple): parameters of the indicator
+        calculate (Callable[[], Any]): calculate the indicator
+
+    Returns:
+        Any: indicator
+    """
+    if indicator_cache is None:
+        return calculate()
+    return indicator_cache.get_or_calculate(
+        df_price=df_price, indicator=indicator, params=params, calculate=calculate
+    )
+
+
 def calculate_log_price_change(df_price: pd.Series) -> pd.Series:
     """calculate log price change from pandas series
 
@@ -16,6 +106,25 @@ def calculate_log_price_change(df_price: pd.Series) -> pd.Series:
     return log_price_change
 
 
+def calculate_log_price_change_array(price: np.ndarray) -> np.ndarray:
+    """calculate log price change along the last axis of numpy array
+        same as calculate_log_price_change without pandas Series
+
+    Args:
+        price (np.ndarray): price array
+
+    Returns:
+        np.ndarray: log price change, first value is NaN
+    """
+    price = np.asarray(price, dtype=np.float64)
+    log_price_change = np.empty(price.shape)
+    log_price_change[..., :1] = np.nan
+    np.divide(price[..., 1:], price[..., :-1], out=log_price_change[..., 1:])
+    np.log(log_price_change[..., 1:], out=log_price_change[..., 1:])
+
+    return log_price_change
+
+
 def calculate_simple_moving_average(df_price: pd.Series, window: int) -> pd.Series:
     """calculate simple moving average from pandas series
 
@@ -31,6 +140,196 @@ def calculate_simple_moving_average(df_price: pd.Series, window: int) -> pd.Seri
     return sma
 
 
+class Prefix_Sum(NamedTuple):
+    """compensated prefix sum along the last axis, with one leading zero"""
+
+    total: np.ndarray  # running sum
+    compensation: np.ndarray  # accumulated rounding error of the running sum
+    valid_count: np.ndarray  # running count of non NaN values
+
+
+def calculate_prefix_sum(
+    values: Union[np.ndarray, pd.Series], initial: Optional[Prefix_Sum] = None
+) -> Prefix_Sum:
+    """calculate compensated prefix sum in a single cumulative sum pass
+        rounding error of each addition is recovered exactly (TwoSum),
+        so window sums keep full precision on long series
+
+    Args:
+        values (Union[np.ndarray, pd.Series]): price array, NaN is skipped
+        initial (Optional[Prefix_Sum], optional): prefix sum of the preceding values with one
+            element along the last axis, to continue a longer series chunk by chunk. Defaults to None.
+
+    Returns:
+        Prefix_Sum: prefix sum
+    """
+    values = np.asarray(values, dtype=np.float64)
+    is_valid = ~np.isnan(values)
+    values = np.where(is_valid, values, 0.0)
+    shape = values.shape[:-1] + (values.shape[-1] + 1,)
+
+    # the leading element is the initial sum, accumulated in the same order as one long series
+    total = np.zeros(shape)
+    if initial is not None:
+        total[..., :1] = initial.total
+    total[..., 1:] = values
+    np.cumsum(total, axis=-1, out=total)
+    # TwoSum: exact rounding error of total[i] = total[i-1] + values[i-1]
+    prev_total = total[..., :-1]
+    virtual_value = total[..., 1:] - prev_total
+    virtual_prev_total = total[..., 1:] - virtual_value
+    error = (prev_total - virtual_prev_total) + (values - virtual_value)
+    compensation = np.zeros(shape)
+    if initial is not None:
+        compensation[..., :1] = initial.compensation
+    compensation[..., 1:] = error
+    np.cumsum(compensation, axis=-1, out=compensation)
+
+    valid_count = np.zeros(shape, dtype=np.int64)
+    np.cumsum(is_valid, axis=-1, out=valid_count[..., 1:])
+    if initial is not None:
+        valid_count += initial.valid_count
+    return Prefix_Sum(
+        total=total, compensation=compensation, valid_count=valid_count
+    )
+
+
+def get_prefix_sum_at(prefix_sum: Prefix_Sum, index: int) -> Prefix_Sum:
+    """prefix sum of the first index values, as initial of the following chunk
+
+    Args:
+        prefix_sum (Prefix_Sum): prefix sum
+        index (int): number of values
+
+    Returns:
+        Prefix_Sum: prefix sum with one element along the last axis
+    """
+    return Prefix_Sum(*[p[..., index : index + 1] for p in prefix_sum])
+
+
+def calculate_simple_moving_average_bank(
+    values: Union[np.ndarray, pd.Series],
+    windows: list[int],
+    prefix_sum: Optional[Prefix_Sum] = None,
+) -> np.ndarray:
+    """calculate simple moving average of many windows from one prefix sum
+        same as calculate_simple_moving_average for each window,
+        NaN if the window is not full or contains NaN
+
+    Args:
+        values (Union[np.ndarray, pd.Series]): price array
+        windows (list[int]): list of window size
+        prefix_sum (Optional[Prefix_Sum], optional): precalculated prefix sum of values. Defaults to None.
+
+    Returns:
+        np.ndarray: [len(windows) x N] simple moving averages
+    """
+    if prefix_sum is None:
+        prefix_sum = calculate_prefix_sum(values)
+    total, compensation, valid_count = prefix_sum
+    length = total.shape[-1] - 1
+
+    sma_bank = np.full((len(windows),) + total.shape[:-1] + (length,), np.nan)
+    for i, window in enumerate(windows):
+        if window > length:
+            continue
+        window_sum = (total[..., window:] - total[..., :-window]) + (
+            compensation[..., window:] - compensation[..., :-window]
+        )
+        window_count = valid_count[..., window:] - valid_count[..., :-window]
+        sma_bank[i, ..., window - 1 :] = np.where(
+            window_count == window, window_sum / window, np.nan
+        )
+    return sma_bank
+
+
+# relative tolerance of a tie of two lines, differences of this size are rounding
+# e.g. between SMA of flat tick-grid prices from different summation orders
+CROSS_OVER_TIE_TOLERANCE: float = 1024 * np.finfo(np.float64).eps
+
+
+def calculate_cross_over(
+    lineA_minus_lineB: np.ndarray, line_scale: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """lineA cross above lineB along the last axis,
+        i.e. lineA - lineB turns from negative to positive, False where either is NaN.
+        The lines tie where |lineA - lineB| <= CROSS_OVER_TIE_TOLERANCE * line_scale,
+        a tie is neither negative nor positive, so rounding noise of two equal lines
+        is never a cross over
+
+    Args:
+        lineA_minus_lineB (np.ndarray): difference of the two lines
+        line_scale (Optional[np.ndarray], optional): max(|lineA|, |lineB|) to detect ties,
+            None for exact comparison. Defaults to None.
+
+    Returns:
+        np.ndarray: array of True or False, first value is False
+    """
+    lineA_minus_lineB = np.asarray(lineA_minus_lineB, dtype=np.float64)
+    if line_scale is not None:
+        is_tie = np.abs(lineA_minus_lineB) <= CROSS_OVER_TIE_TOLERANCE * np.asarray(
+            line_scale, dtype=np.float64
+        )
+        lineA_minus_lineB = np.where(is_tie, 0.0, lineA_minus_lineB)
+    cross_over = np.zeros(lineA_minus_lineB.shape, dtype=bool)
+    np.logical_and(
+        lineA_minus_lineB[..., 1:] > 0,
+        lineA_minus_lineB[..., :-1] < 0,
+        out=cross_over[..., 1:],
+    )
+    return cross_over
+
+
+def calculate_sma_cross_bank(
+    values: Union[np.ndarray, pd.Series],
+    window_pairs: list[tuple[int, int]],
+    prefix_sum: Optional[Prefix_Sum] = None,
+) -> np.ndarray:
+    """calculate SMA cross over of many window pairs in one pass
+        each distinct SMA window is calculated once from one prefix sum,
+        then all cross overs are detected by one broadcasted sign change
+
+    Args:
+        values (Union[np.ndarray, pd.Series]): price array
+        window_pairs (list[tuple[int, int]]): list of (sma_window_1, sma_window_2),
+            True where SMA of sma_window_1 crosses above SMA of sma_window_2
+        prefix_sum (Optional[Prefix_Sum], optional): precalculated prefix sum of values. Defaults to None.
+
+    Returns:
+        np.ndarray: [len(window_pairs) x N] cross over signals
+    """
+    windows = sorted({window for pair in window_pairs for window in pair})
+    sma_bank = calculate_simple_moving_average_bank(
+        values, windows=windows, prefix_sum=prefix_sum
+    )
+    window_position = {window: i for i, window in enumerate(windows)}
+    sma_1_index = [window_position[window_1] for window_1, _ in window_pairs]
+    sma_2_index = [window_position[window_2] for _, window_2 in window_pairs]
+    sma_1, sma_2 = sma_bank[sma_1_index], sma_bank[sma_2_index]
+    return calculate_cross_over(
+        sma_1 - sma_2, line_scale=np.maximum(np.abs(sma_1), np.abs(sma_2))
+    )
+
+
+def calculate_up_down_move_array(price: np.ndarray) -> np.ndarray:
+    """calculate upward and downward price move along the last axis of numpy array
+
+    Args:
+        price (np.ndarray): price array
+
+    Returns:
+        np.ndarray: [2 x N] upward move, downward move (positive value), first value is NaN
+    """
+    price = np.asarray(price, dtype=np.float64)
+    up_down_move = np.empty((2,) + price.shape)
+    up_down_move[..., :1] = np.nan
+    delta = np.subtract(price[..., 1:], price[..., :-1])
+    np.maximum(delta, 0, out=up_down_move[0][..., 1:])
+    np.minimum(delta, 0, out=up_down_move[1][..., 1:])
+    np.negative(up_down_move[1], out=up_down_move[1])
+    return up_down_move
+
+
 def calculate_rsi(df_price: pd.Series, window: int) -> pd.Series:
     """calculate relative strength index from pandas series
 
@@ -50,3 +349,299 @@ def calculate_rsi(df_price: pd.Series, window: int) -> pd.Series:
     rsi = 100 - (100 / (1 + rsi))
 
     return rsi
+
+
+# largest log scale of the in-block EWM weights, keeps them far from overflow
+_EWM_BLOCK_LOG_SCALE: float = 300.0
+
+
+def _get_ewm_block_size(decay: float, length: int) -> int:
+    """block size of _calculate_ewm_sum, decay^-block_size stays in float64 range"""
+    return int(min(length, max(1, _EWM_BLOCK_LOG_SCALE / -np.log(decay))))
+
+
+def _calculate_ewm_sum(
+    values: np.ndarray, decay: float, scale: float = 1.0
+) -> np.ndarray:
+    """exponential weighted running sum along the last axis:
+        sum[t] = decay * sum[t-1] + values[t]
+        inside a block it is a weighted cumulative sum, blocks are chained by a short scan
+
+    Args:
+        values (np.ndarray): [..., N] values without NaN
+        decay (float): decay factor, 0 < decay < 1
+        scale (float, optional): scale of the output. Defaults to 1.0.
+
+    Returns:
+        np.ndarray: [..., N] scale * weighted running sum
+    """
+    ewm_sum, _ = _calculate_ewm_sum_with_carry(
+        values,
+        decay=decay,
+        scale=scale,
+        block_size=_get_ewm_block_size(decay, values.shape[-1]),
+    )
+    return ewm_sum
+
+
+def _calculate_ewm_sum_with_carry(
+    values: np.ndarray,
+    decay: float,
+    scale: float,
+    block_size: int,
+    initial_carry: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """_calculate_ewm_sum which continues from the running sum before values
+        values must start at a block boundary of the whole series, so that
+        the result is the same as calculating the whole series at once
+
+    Args:
+        values (np.ndarray): [..., N] values without NaN
+        decay (float): decay factor, 0 < decay < 1
+        scale (float): scale of the output
+        block_size (int): block size of the whole series
+        initial_carry (Optional[np.ndarray], optional): [...] running sum before values. Defaults to None.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: [..., N] scale * weighted running sum,
+            [..., num of block + 1] running sum before each block, the last ones are
+            only valid for complete blocks
+    """
+    length = values.shape[-1]
+    num_of_block = -(-length // block_size)
+    num_of_full_block = length // block_size
+    full_length = num_of_full_block * block_size
+    exponent = np.arange(block_size)
+
+    # sum[s+j] = decay^j * cumsum(values[s+i] * decay^-i), with sum[s-1] carried into i = 0
+    block_sum = np.empty(values.shape[:-1] + (num_of_block, block_size))
+    np.multiply(
+        values[..., :full_length].reshape(
+            values.shape[:-1] + (num_of_full_block, block_size)
+        ),
+        decay**-exponent,
+        out=block_sum[..., :num_of_full_block, :],
+    )
+    if num_of_full_block < num_of_block:
+        tail_length = length - full_length
+        block_sum[..., -1, :tail_length] = (
+            values[..., full_length:] * decay ** -exponent[:tail_length]
+        )
+        block_sum[..., -1, tail_length:] = 0.0
+
+    # chain the blocks: carry is the running sum at the end of previous block
+    block_end_sum = block_sum.sum(axis=-1) * decay ** (block_size - 1)
+    block_decay = decay**block_size
+    carry = np.zeros(block_end_sum.shape[:-1] + (num_of_block + 1,))
+    if initial_carry is not None:
+        carry[..., 0] = initial_carry
+    for i in range(1, num_of_block + 1):
+        carry[..., i] = block_decay * carry[..., i - 1] + block_end_sum[..., i - 1]
+    block_sum[..., 0] += decay * carry[..., :num_of_block]
+
+    np.cumsum(block_sum, axis=-1, out=block_sum)
+    block_sum *= scale * decay**exponent
+    return block_sum.reshape(values.shape[:-1] + (-1,))[..., :length], carry
+
+
+def _calculate_ewm_mean_bank(values: np.ndarray, windows: list[int]) -> np.ndarray:
+    """exponential weighted mean of many windows along the last axis,
+        same as pd.Series.ewm(com=window - 1, adjust=True, min_periods=window).mean()
+
+    Args:
+        values (np.ndarray): [..., N] values
+        windows (list[int]): list of window size
+
+    Returns:
+        np.ndarray: [len(windows) x ... x N] exponential weighted mean
+    """
+    values = np.asarray(values, dtype=np.float64)
+    length = values.shape[-1]
+    ewm_bank = np.empty((len(windows),) + values.shape)
+    if length == 0:
+        return ewm_bank
+    is_valid = ~np.isnan(values)
+    first_valid_index = np.where(
+        is_valid.any(axis=-1), np.argmax(is_valid, axis=-1), length
+    )
+    # NaN only at the beginning, e.g. price change
+    is_leading_nan_only = bool(
+        (is_valid.sum(axis=-1) == length - first_valid_index).all()
+    )
+    if is_leading_nan_only:
+        valid_values = values.copy()
+        leading_length = int(first_valid_index.max())
+        valid_values[..., :leading_length][~is_valid[..., :leading_length]] = 0.0
+        # count of valid values is only needed at the beginning
+        time_index = np.arange(length)
+        first_valid_index = first_valid_index[..., None]
+    else:
+        valid_values = np.where(is_valid, values, 0.0)
+        valid_count = np.cumsum(is_valid, axis=-1)
+
+    for i, window in enumerate(windows):
+        if window == 1:
+            # no memory, the mean is the latest valid value
+            latest_valid_index = np.maximum.accumulate(
+                np.where(is_valid, np.arange(length), 0), axis=-1
+            )
+            ewm_bank[i] = np.take_along_axis(values, latest_valid_index, axis=-1)
+        elif is_leading_nan_only:
+            # adjusted weights: mean = sum(decay^i * value) / sum(decay^i)
+            # sum of weights is (1 - decay^count) / (1 - decay),
+            # i.e. 1 / (1 - decay) after decay^count vanishes
+            decay = 1.0 - 1.0 / window
+            ewm_bank[i] = _calculate_ewm_sum(
+                valid_values, decay=decay, scale=1.0 - decay
+            )
+            warm_up_length = min(
+                length, leading_length + max(window, int(-37 / np.log(decay)) + 1)
+            )
+            valid_count = np.maximum(
+                time_index[:warm_up_length] - first_valid_index + 1, 0
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ewm_bank[i][..., :warm_up_length] /= 1.0 - decay**valid_count
+            # min_periods = window
+            ewm_bank[i][..., :warm_up_length][valid_count < window] = np.nan
+            continue
+        else:
+            decay = 1.0 - 1.0 / window
+            with np.errstate(divide="ignore", invalid="ignore"):
+                np.divide(
+                    _calculate_ewm_sum(valid_values, decay=decay),
+                    _calculate_ewm_sum(is_valid.astype(np.float64), decay=decay),
+                    out=ewm_bank[i],
+                )
+        # min_periods = window
+        if is_leading_nan_only:
+            ewm_bank[i][(time_index - first_valid_index + 1) < window] = np.nan
+        else:
+            ewm_bank[i][valid_count < window] = np.nan
+    return ewm_bank
+
+
+def calculate_rsi_bank(
+    values: Union[np.ndarray, pd.Series],
+    windows: list[int],
+    up_down_move: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """calculate relative strength index of many windows in one pass
+        same as calculate_rsi for each window
+
+    Args:
+        values (Union[np.ndarray, pd.Series]): price array
+        windows (list[int]): list of window size
+        up_down_move (Optional[np.ndarray], optional): precalculated upward and downward move of values. Defaults to None.
+
+    Returns:
+        np.ndarray: [len(windows) x N] relative strength index
+    """
+    if up_down_move is None:
+        up_down_move = calculate_up_down_move_array(values)
+
+    ma_up_down = _calculate_ewm_mean_bank(up_down_move, windows=windows)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        rsi = ma_up_down[:, 0] / ma_up_down[:, 1]
+        rsi += 1
+        np.divide(100, rsi, out=rsi)
+        np.subtract(100, rsi, out=rsi)
+
+    return rsi
+
+
+class Rsi_Chunk_Calculator:
+    """relative strength index of one long price series calculated chunk by chunk
+    the running sums are carried at block boundaries of the whole series, so each chunk
+    is the same as calculate_rsi_bank over the whole series without NaN
+    """
+
+    def __init__(self, window: int, length: int) -> None:
+        """initialize chunked RSI
+
+        Args:
+            window (int): window size
+            length (int): length of the whole price series
+        """
+        self.window = window
+        self.decay = 1.0 - 1.0 / window
+        self.block_size = (
+            _get_ewm_block_size(self.decay, length) if window > 1 else length
+        )
+        # running sum of upward and downward move before each block from first_block on
+        self._first_block: int = 0
+        self._block_carry: np.ndarray = np.zeros((2, 1))
+
+    def get_aligned_start(self, start: int) -> int:
+        """latest block boundary at or before start, RSI is exact from there on
+
+        Args:
+            start (int): index of the first RSI needed
+
+        Returns:
+            int: index of the block boundary
+        """
+        if self.window == 1:
+            return max(start, 0)
+        return max(start, 0) // self.block_size * self.block_size
+
+    def calculate(self, values: np.ndarray, offset: int, start: int) -> np.ndarray:
+        """calculate RSI of the next chunk
+
+        Args:
+            values (np.ndarray): price chunk without NaN, chunks are in time order
+            offset (int): index of values[0] in the whole series
+            start (int): index of the first RSI needed, values must include the price before it
+
+        Returns:
+            np.ndarray: RSI of the chunk, NaN before the aligned start
+        """
+        values = np.asarray(values, dtype=np.float64)
+        aligned_start = self.get_aligned_start(start)
+        if aligned_start > 0 and aligned_start - 1 < offset:
+            raise ValueError(
+                f"Price chunk from {offset} does not cover RSI start {aligned_start}"
+            )
+        up_down_move = calculate_up_down_move_array(values)[
+            ..., aligned_start - offset :
+        ]
+        if aligned_start == 0:
+            # no price move before the first price, same as calculate_rsi_bank
+            up_down_move[..., 0] = 0.0
+        length = up_down_move.shape[-1]
+        # index of each value in the whole series
+        time_index = np.arange(aligned_start, aligned_start + length)
+
+        if self.window == 1:
+            ma_up_down = up_down_move
+        else:
+            block = aligned_start // self.block_size - self._first_block
+            if not 0 <= block < self._block_carry.shape[-1]:
+                raise ValueError(f"RSI chunks are not in time order: {start}")
+            ma_up_down, block_carry = _calculate_ewm_sum_with_carry(
+                up_down_move,
+                decay=self.decay,
+                scale=1.0 - self.decay,
+                block_size=self.block_size,
+                initial_carry=self._block_carry[..., block],
+            )
+            # keep the running sum before each complete block for the next chunk
+            self._first_block = aligned_start // self.block_size
+            self._block_carry = block_carry[..., : length // self.block_size + 1]
+            # normalise the beginning of the series, same as _calculate_ewm_mean_bank
+            warm_up_length = 1 + max(self.window, int(-37 / np.log(self.decay)) + 1)
+            warm_up_length = max(min(warm_up_length - aligned_start, length), 0)
+            valid_count = time_index[:warm_up_length]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ma_up_down[..., :warm_up_length] /= 1.0 - self.decay**valid_count
+        # min_periods = window, the first price has no move
+        ma_up_down[..., time_index < self.window] = np.nan
+
+        rsi = np.full(values.shape, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            rsi_chunk = ma_up_down[0] / ma_up_down[1]
+            rsi_chunk += 1
+            np.divide(100, rsi_chunk, out=rsi_chunk)
+            np.subtract(100, rsi_chunk, out=rsi_chunk)
+        rsi[..., aligned_start - offset :] = rsi_chunk
+        return rsi
@@ -20,14 +20,14 @@ def _is_eval_data_by_hash(date_time: datetime, split_ratio: float) -> bool:
     )
 
 
-def splitting_training_and_eval_time_range(
+def generate_time_range_with_split(
     start_date: datetime,
     end_date: datetime,
     data_length: timedelta,
     split_ratio: float = 0.8,
     data_step: timedelta = timedelta(days=1),
-) -> tuple[list[tuple], list[tuple]]:
-    """splitting training and eval time range
+) -> list[tuple[tuple, bool]]:
+    """generate time range in chronological order, each with its training/eval split
 
     Args:
         start_date (datetime): start date
@@ -37,7 +37,7 @@ def splitting_training_and_eval_time_range(
         data_step (timedelta, optional): step of the data feature. Defaults to timedelta(days=1).
 
     Returns:
-        tuple[list[tuple], list[tuple]]: training time range, eval time range
+        list[tuple[tuple, bool]]: list of (time range, True if it is eval data)
     """
     # Calculate the number of days
     num_of_data_vector = int((end_date - start_date - data_length) / data_step) + 1
@@ -47,13 +47,46 @@ def splitting_training_and_eval_time_range(
     logger.info(f"num_training_vector: {num_training_vector}")
 
     # Create data vector from start date to end date
-    training_time_range = []
-    eval_time_range = []
+    time_range_with_split = []
     for i in range(num_of_data_vector):
         start_date_vector = start_date + i * data_step
         end_date_vector = start_date_vector + data_length
         data_vector = (start_date_vector, end_date_vector)
-        if _is_eval_data_by_hash(start_date_vector, split_ratio):
+        time_range_with_split.append(
+            (data_vector, _is_eval_data_by_hash(start_date_vector, split_ratio))
+        )
+    return time_range_with_split
+
+
+def splitting_training_and_eval_time_range(
+    start_date: datetime,
+    end_date: datetime,
+    data_length: timedelta,
+    split_ratio: float = 0.8,
+    data_step: timedelta = timedelta(days=1),
+) -> tuple[list[tuple], list[tuple]]:
+    """splitting training and eval time range
+
+    Args:
+        start_date (datetime): start date
+        end_date (datetime): end date
+        data_length (timedelta): length of the data
+        split_ratio (float, optional): split ratio. Defaults to 0.8.
+        data_step (timedelta, optional): step of the data feature. Defaults to timedelta(days=1).
+
+    Returns:
+        tuple[list[tuple], list[tuple]]: training time range, eval time range
+    """
+    training_time_range = []
+    eval_time_range = []
+    for data_vector, is_eval in generate_time_range_with_split(
+        start_date=start_date,
+        end_date=end_date,
+        data_length=data_length,
+        split_ratio=split_ratio,
+        data_step=data_step,
+    ):
+        if is_eval:
             eval_time_range.append(data_vector)
         else:
             training_time_range.append(data_vector)
@@ -1,77 +1,398 @@
 from __future__ import annotations
 from crypto_feature_preprocess.port.interfaces import Feature_Definition
+from concurrent.futures import Executor, ThreadPoolExecutor
 from dataclasses import dataclass
+from datetime import datetime
+import hashlib
+import json
+import os
+import tempfile
+from ..adapter.FeatureCacheStorage import FeatureCacheStorage
 from ..domains.features_gen import (
     Log_Price_Feature,
     RSI_Feature,
     SMA_Cross_Feature,
     Feature,
+    price_tail,
+    resample_price_pyramid,
+    validate_feature_dtype,
+)
+from ..domains.indicators import (
+    Indicator_Backend,
+    Indicator_Cache,
+    Prefix_Sum,
+    Rsi_Chunk_Calculator,
+    calculate_prefix_sum,
+    get_prefix_sum_at,
+)
+from ..domains.features_stream import (
+    Log_Price_Streaming_Feature,
+    RSI_Streaming_Feature,
+    SMA_Cross_Streaming_Feature,
+    Streaming_Feature,
 )
 from .interfaces import (
     Feature_Definition,
     SMA_Cross_Feature_Interface,
     Log_Price_Feature_Interface,
     RSI_Feature_Interface,
+    Time_Alignment_Enum,
 )
 
 import pandas as pd
 import numpy as np
-from typing import NamedTuple, Union
+from numpy.typing import DTypeLike
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Union
 from crypto_feature_preprocess.logging import get_logger
 
 logger = get_logger(__name__)
 
 
-def _initialize_price_feature_instance(nt: NamedTuple, price: pd.Series) -> Feature:
-    """Initialize feature instance from namedtuple"""
-    if isinstance(nt, Log_Price_Feature_Interface):
-        return Log_Price_Feature(**(nt._asdict()), df_price=price)
-    elif isinstance(nt, SMA_Cross_Feature_Interface):
-        return SMA_Cross_Feature(**(nt._asdict()), df_price=price)
-    elif isinstance(nt, RSI_Feature_Interface):
-        return RSI_Feature(**(nt._asdict()), df_price=price)
-    else:
+# feature class of each feature interface
+PRICE_FEATURE_REGISTRY: dict[type, type[Feature]] = {
+    Log_Price_Feature_Interface: Log_Price_Feature,
+    SMA_Cross_Feature_Interface: SMA_Cross_Feature,
+    RSI_Feature_Interface: RSI_Feature,
+}
+STREAMING_FEATURE_REGISTRY: dict[type, type[Streaming_Feature]] = {
+    Log_Price_Feature_Interface: Log_Price_Streaming_Feature,
+    SMA_Cross_Feature_Interface: SMA_Cross_Streaming_Feature,
+    RSI_Feature_Interface: RSI_Streaming_Feature,
+}
+
+
+def _get_registered_feature_class(nt: NamedTuple, registry: dict[type, type]) -> type:
+    """Resolve feature class of the namedtuple from registry"""
+    feature_class = registry.get(type(nt))
+    if feature_class is None:
         raise NotImplementedError(f"Not supporting this config: {nt}")
+    return feature_class
+
+
+def _initialize_price_feature_instance(
+    nt: NamedTuple,
+    price: Union[pd.Series, np.ndarray],
+    indicator_cache: Optional[Indicator_Cache] = None,
+    backend: Indicator_Backend = Indicator_Backend.PANDAS,
+) -> Feature:
+    """Initialize feature instance from namedtuple"""
+    feature_class = _get_registered_feature_class(nt, PRICE_FEATURE_REGISTRY)
+    return feature_class(
+        **(nt._asdict()),
+        df_price=price,
+        indicator_cache=indicator_cache,
+        backend=backend,
+    )
+
+
+def _initialize_streaming_feature_instance(nt: NamedTuple) -> Streaming_Feature:
+    """Initialize streaming feature instance from namedtuple"""
+    feature_class = _get_registered_feature_class(nt, STREAMING_FEATURE_REGISTRY)
+    return feature_class(**(nt._asdict()))
+
+
+def _map_concurrently(
+    function: Callable[[Any], Any],
+    items: Iterable,
+    executor: Optional[Executor] = None,
+) -> list:
+    """Apply function to each item, concurrently if executor is given
+
+    Args:
+        function (Callable[[Any], Any]): function of one item
+        items (Iterable): items
+        executor (Optional[Executor], optional): executor, None to run serially. Defaults to None.
+
+    Returns:
+        list: results in the order of items
+    """
+    if executor is None:
+        return [function(item) for item in items]
+    return list(executor.map(function, items))
 
 
 def _trim_feature_to_same_length_and_group(
-    feature_data_list: list[np.ndarray], time_index: np.ndarray
+    feature_data_list: list[np.ndarray],
+    time_index: np.ndarray,
+    dtype: Optional[DTypeLike] = None,
 ) -> tuple[np.ndarray, np.ndarray]:
     """Trim all feature to the same length and group them together
 
     Args:
         feature_data_list (list[np.ndarray]): list of feature
+        dtype (Optional[DTypeLike], optional): dtype of the grouped feature,
+            None to follow the dtype of the features. Defaults to None.
 
     Returns:
         tuple (np.ndarray, np.ndarray): feature with same length, time index
     """
     # Find the shortest feature length in feature_set
     shortest_feature_length = min([len(f) for f in feature_data_list])
-    # Trim all feature to the same length
-    feature_data_list = [
-        f[-shortest_feature_length:].reshape(shortest_feature_length, -1)
-        for f in feature_data_list
+    # Allocate the grouped feature once and write each trimmed feature into its columns
+    feature_width_list = [
+        int(np.prod(f.shape[1:], dtype=np.int64)) for f in feature_data_list
     ]
-    new_feature_data_list = np.concatenate(feature_data_list, axis=1)
-    new_time_index = time_index[-shortest_feature_length:]
+    new_feature_data_list = np.empty(
+        (shortest_feature_length, sum(feature_width_list)),
+        dtype=np.result_type(*feature_data_list) if dtype is None else dtype,
+    )
+    column = 0
+    for f, width in zip(feature_data_list, feature_width_list):
+        new_feature_data_list[:, column : column + width] = f[
+            len(f) - shortest_feature_length :
+        ].reshape(shortest_feature_length, width)
+        column += width
+    new_time_index = time_index[len(time_index) - shortest_feature_length :]
     return new_feature_data_list, new_time_index
 
 
+def _align_feature_to_time_index(
+    feature_data_list: list[np.ndarray],
+    time_index_list: list[pd.DatetimeIndex],
+    time_index: pd.DatetimeIndex,
+    alignment: Time_Alignment_Enum,
+    dtype: Optional[DTypeLike] = None,
+) -> tuple[np.ndarray, pd.DatetimeIndex]:
+    """As-of join of each feature to the target time index into one preallocated array
+        rows before the latest start of the features are dropped, rows without a match
+        e.g. a gap in exact alignment are filled with NaN
+
+    Args:
+        feature_data_list (list[np.ndarray]): list of feature data
+        time_index_list (list[pd.DatetimeIndex]): sorted time index of each feature data
+        time_index (pd.DatetimeIndex): sorted target time index
+        alignment (Time_Alignment_Enum): EXACT matches the same timestamp only,
+            BACKWARD takes the latest feature row at or before the timestamp
+        dtype (Optional[DTypeLike], optional): floating dtype of the output,
+            None for the common dtype of the features. Defaults to None.
+
+    Returns:
+        tuple[np.ndarray, pd.DatetimeIndex]: aligned feature data, aligned time index
+    """
+    alignment = Time_Alignment_Enum(alignment)
+    for t in time_index_list + [time_index]:
+        if not t.is_monotonic_increasing:
+            raise ValueError("Time index of as-of merge must be sorted")
+    if dtype is None:
+        dtype = validate_feature_dtype(np.result_type(*feature_data_list))
+    # no row before every feature has started
+    start_list = [t[0] for t in time_index_list if len(t) > 0]
+    if len(start_list) < len(time_index_list):
+        time_index = time_index[:0]
+    elif len(start_list) > 0:
+        time_index = time_index[time_index.searchsorted(max(start_list), side="left") :]
+    column_offsets = np.cumsum([0] + [d.shape[1] for d in feature_data_list])
+    new_feature_data = np.full(
+        (len(time_index), column_offsets[-1]), np.nan, dtype=dtype
+    )
+    for i, (feature_data, feature_time_index) in enumerate(
+        zip(feature_data_list, time_index_list)
+    ):
+        if alignment == Time_Alignment_Enum.EXACT:
+            row_index = feature_time_index.searchsorted(time_index, side="left")
+            row_index = np.minimum(row_index, len(feature_time_index) - 1)
+            is_matched = feature_time_index[row_index] == time_index
+        else:
+            row_index = feature_time_index.searchsorted(time_index, side="right") - 1
+            is_matched = row_index >= 0
+        new_feature_data[is_matched, column_offsets[i] : column_offsets[i + 1]] = (
+            feature_data[row_index[is_matched]]
+        )
+    return new_feature_data, time_index
+
+
+def _replace_file(filepath: str, write: Callable[[Any], None]) -> None:
+    """Write to a temporary file in the same folder then rename it over filepath,
+        readers never see a partial file and memory maps of the old file stay valid
+
+    Args:
+        filepath (str): file to replace
+        write (Callable[[Any], None]): write the content to the binary file object
+    """
+    fd, temp_filepath = tempfile.mkstemp(dir=os.path.dirname(filepath), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temp_filepath, filepath)
+    except BaseException:
+        os.remove(temp_filepath)
+        raise
+
+
+def _feature_metadata_to_json(metadata: Union[Feature_Definition, list]) -> Any:
+    """Canonical json object of feature metadata, nested lists come from merged outputs"""
+    if isinstance(metadata, Feature_Definition):
+        return {
+            "meta": metadata.meta,
+            "type": type(metadata.data).__name__,
+            "params": metadata.data._asdict(),
+        }
+    return [_feature_metadata_to_json(m) for m in metadata]
+
+
+def _feature_metadata_from_json(metadata: Any) -> Union[Feature_Definition, list]:
+    """Feature metadata of json object from _feature_metadata_to_json"""
+    if isinstance(metadata, list):
+        return [_feature_metadata_from_json(m) for m in metadata]
+    interface_by_name = {
+        interface.__name__: interface for interface in PRICE_FEATURE_REGISTRY
+    }
+    if metadata["type"] not in interface_by_name:
+        raise ValueError(f"Unknown feature interface: {metadata['type']}")
+    return Feature_Definition(
+        meta=metadata["meta"],
+        data=interface_by_name[metadata["type"]](**metadata["params"]),
+    )
+
+
 @dataclass
 class Feature_Output:
     metadata: list[Union[Feature_Definition, list]]
     time_index: np.ndarray
     feature_data: np.ndarray  # [N X (accm of feature dimension)] matrix of features
 
+    @property
+    def dtype(self) -> np.dtype:
+        return self.feature_data.dtype
+
+    def get_index_range(self, start: datetime, end: datetime) -> tuple[int, int]:
+        """Row index range of the feature with time index in [start, end]
+
+        Args:
+            start (datetime): start time, inclusive
+            end (datetime): end time, inclusive
+
+        Returns:
+            tuple[int, int]: start row index, end row index (exclusive)
+        """
+        time_index = pd.DatetimeIndex(self.time_index)
+        return (
+            int(time_index.searchsorted(start, side="left")),
+            int(time_index.searchsorted(end, side="right")),
+        )
+
+    def slice_time_range(self, start: datetime, end: datetime) -> Feature_Output:
+        """Feature output of time range [start, end], feature data is a view without copy
+
+        Args:
+            start (datetime): start time, inclusive
+            end (datetime): end time, inclusive
+
+        Returns:
+            Feature_Output: feature output of the time range
+        """
+        start_index, end_index = self.get_index_range(start=start, end=end)
+        return Feature_Output(
+            metadata=self.metadata,
+            time_index=self.time_index[start_index:end_index],
+            feature_data=self.feature_data[start_index:end_index],
+        )
+
+    FEATURE_DATA_FILENAME = "feature_data.npy"
+    TIME_INDEX_FILENAME = "time_index.npy"
+    METADATA_FILENAME = "metadata.json"
+
+    def save(self, folder: str) -> None:
+        """Save feature output to folder, feature data and time index as aligned .npy
+            files and metadata as json sidecar
+
+        Args:
+            folder (str): output folder, created if not exist
+        """
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        time_index = self.time_index
+        tz = None
+        if isinstance(time_index, pd.DatetimeIndex):
+            # datetime64 values are in UTC for timezone aware index
+            tz = None if time_index.tz is None else str(time_index.tz)
+        # each file is replaced by rename, processes which memory-mapped the old
+        # files keep reading them, metadata is replaced last
+        _replace_file(
+            os.path.join(folder, self.FEATURE_DATA_FILENAME),
+            lambda f: np.save(f, np.ascontiguousarray(self.feature_data)),
+        )
+        _replace_file(
+            os.path.join(folder, self.TIME_INDEX_FILENAME),
+            lambda f: np.save(
+                f,
+                np.asarray(time_index.values if tz else time_index),
+                allow_pickle=False,
+            ),
+        )
+        sidecar = {
+            "metadata": _feature_metadata_to_json(self.metadata),
+            "tz": tz,
+            "shape": list(self.feature_data.shape),
+            "dtype": self.feature_data.dtype.str,
+        }
+        _replace_file(
+            os.path.join(folder, self.METADATA_FILENAME),
+            lambda f: f.write(json.dumps(sidecar, default=str).encode()),
+        )
+
+    @staticmethod
+    def load(folder: str, mmap: bool = True) -> Feature_Output:
+        """Load feature output saved by Feature_Output.save
+
+        Args:
+            folder (str): folder of the saved feature output
+            mmap (bool, optional): memory-map the feature data read-only, processes loading
+                the same folder share the pages through the OS cache. Defaults to True.
+
+        Returns:
+            Feature_Output: feature output
+        """
+        with open(os.path.join(folder, Feature_Output.METADATA_FILENAME)) as f:
+            sidecar = json.load(f)
+        feature_data = np.load(
+            os.path.join(folder, Feature_Output.FEATURE_DATA_FILENAME),
+            mmap_mode="r" if mmap else None,
+        )
+        time_values = np.load(
+            os.path.join(folder, Feature_Output.TIME_INDEX_FILENAME),
+            allow_pickle=False,
+        )
+        time_index: Any = time_values
+        if np.issubdtype(time_values.dtype, np.datetime64):
+            time_index = pd.DatetimeIndex(time_values)
+            if sidecar["tz"] is not None:
+                time_index = time_index.tz_localize("UTC").tz_convert(sidecar["tz"])
+        # files of a save in progress into the same folder
+        if list(feature_data.shape) != sidecar["shape"]:
+            raise ValueError(
+                f"Feature data shape {feature_data.shape} mismatches metadata {sidecar['shape']}"
+            )
+        if len(time_index) != len(feature_data):
+            raise ValueError(
+                f"Time index length {len(time_index)} mismatches feature data {feature_data.shape}"
+            )
+        return Feature_Output(
+            metadata=_feature_metadata_from_json(sidecar["metadata"]),
+            time_index=time_index,
+            feature_data=feature_data,
+        )
+
     @staticmethod
     def merge_feature_output_list(
         feature_output_list: list[Feature_Output],
+        dtype: Optional[DTypeLike] = None,
+        alignment: Optional[Time_Alignment_Enum] = None,
+        time_index: Optional[pd.DatetimeIndex] = None,
     ) -> Feature_Output:
         """Merge list of feature output into one feature output
-            assumption: those feature output has the same time index
+            assumption without alignment: those feature output has the same time index
             i.e. coming from data source with the same sampling frequency
         Args:
             feature_output_list (list[Feature_Output]): list of feature outpur
+            dtype (Optional[DTypeLike], optional): floating dtype of the merged feature,
+                None to follow the dtype of the feature outputs. Defaults to None.
+            alignment (Optional[Time_Alignment_Enum], optional): align the feature outputs on
+                their timestamps, EXACT or BACKWARD as-of join e.g. 1H feature onto 15Min feature,
+                the timestamp should be when the feature is known to avoid look-ahead.
+                None to trim the tails to the same length. Defaults to None.
+            time_index (Optional[pd.DatetimeIndex], optional): target time index of the alignment,
+                None for the longest time index of the feature outputs. Defaults to None.
         Returns:
             Feature_Output: new Feature Output
         """
@@ -79,6 +400,27 @@ class Feature_Output:
         # 1) Merge metadata first
         new_metadata = [f.metadata for f in feature_output_list]
 
+        if alignment is not None:
+            time_index_list = [
+                pd.DatetimeIndex(f.time_index) for f in feature_output_list
+            ]
+            if time_index is None:
+                time_index = max(time_index_list, key=len)
+            if dtype is not None:
+                dtype = validate_feature_dtype(dtype)
+            new_feature_data, new_time_index = _align_feature_to_time_index(
+                feature_data_list=[f.feature_data for f in feature_output_list],
+                time_index_list=time_index_list,
+                time_index=pd.DatetimeIndex(time_index),
+                alignment=alignment,
+                dtype=dtype,
+            )
+            return Feature_Output(
+                metadata=new_metadata,
+                time_index=new_time_index,
+                feature_data=new_feature_data,
+            )
+
         # 2) Merge feature data
         # base on the assumption that all feature output has the same time index
         # find the longest time index from the pool
@@ -90,8 +432,12 @@ class Feature_Output:
         old_feature_data_lst: list[np.ndarray] = [
             f.feature_data for f in feature_output_list
         ]
+        if dtype is not None:
+            dtype = validate_feature_dtype(dtype)
         new_feature_data, new_time_index = _trim_feature_to_same_length_and_group(
-            feature_data_list=old_feature_data_lst, time_index=longest_time_index
+            feature_data_list=old_feature_data_lst,
+            time_index=longest_time_index,
+            dtype=dtype,
         )
         return Feature_Output(
             metadata=new_metadata,
@@ -100,38 +446,616 @@ class Feature_Output:
         )
 
 
+class Feature_Plan:
+    """Feature plan compiled once from feature schema
+    It resolves the feature classes and precomputes the output layout, warm-up
+    and shared indicators, then runs on many data vectors without per-call setup
+    """
+
+    def __init__(
+        self,
+        feature_schema_list: list[Feature_Definition],
+        backend: Indicator_Backend = Indicator_Backend.PANDAS,
+        dtype: DTypeLike = np.float64,
+    ) -> None:
+        """compile feature plan
+
+        Args:
+            feature_schema_list (list[Feature_Definition]): feature to aggregate
+            backend (Indicator_Backend, optional): indicator backend. Defaults to Indicator_Backend.PANDAS.
+            dtype (DTypeLike, optional): floating dtype of the feature data. Defaults to np.float64.
+        """
+        self.feature_schema_list = feature_schema_list
+        self.backend = Indicator_Backend(backend)
+        self.dtype = validate_feature_dtype(dtype)
+        # feature templates, bound to the data vector of each run
+        self.feature_list: list[Feature] = [
+            _get_registered_feature_class(f_def.data, PRICE_FEATURE_REGISTRY)(
+                **(f_def.data._asdict()), df_price=None, backend=self.backend
+            )
+            for f_def in feature_schema_list
+        ]
+        self.column_offsets: np.ndarray = np.cumsum(
+            [0] + [f.dimension for f in self.feature_list]
+        )
+        self.output_width: int = int(self.column_offsets[-1])
+        # leading rows of data vector without a feature row
+        self.warm_up_length: int = max([f.warm_up_length for f in self.feature_list])
+        # rows of data vector before a feature row its calculation reads
+        self.look_behind_length: int = max(
+            [f.look_behind_length for f in self.feature_list]
+        )
+        indicator_list = [i for f in self.feature_list for i in f.indicators]
+        self.indicators: list[tuple] = list(dict.fromkeys(indicator_list))
+        # indicator cache is only needed when features share indicators
+        self.is_sharing_indicators: bool = len(self.indicators) < len(indicator_list)
+
+    def output_length(self, data_length: int) -> int:
+        """number of feature rows of a data vector without nan
+
+        Args:
+            data_length (int): length of data vector
+
+        Returns:
+            int: number of feature rows
+        """
+        return max(data_length - self.warm_up_length, 0)
+
+    def tail_length(self, n: int = 1) -> int:
+        """minimal number of latest data rows to calculate the latest n feature rows
+
+        Args:
+            n (int, optional): number of latest feature rows. Defaults to 1.
+
+        Returns:
+            int: number of data rows
+        """
+        return max([f.tail_length(n) for f in self.feature_list])
+
+    def _output_feature_data(
+        self,
+        price: Union[pd.Series, np.ndarray],
+        backend: Indicator_Backend,
+        max_workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        tail: Optional[int] = None,
+        indicator_cache: Optional[Indicator_Cache] = None,
+    ) -> np.ndarray:
+        """Bind the features to price and write them into one preallocated array
+
+        Returns:
+            np.ndarray: [... x N x output_width] feature data, leading axes follow price
+        """
+        # indicators shared by all features of this run
+        if indicator_cache is None and self.is_sharing_indicators:
+            indicator_cache = Indicator_Cache()
+        feature_list: list[Feature] = [
+            f.bind(df_price=price, indicator_cache=indicator_cache, backend=backend)
+            for f in self.feature_list
+        ]
+        column_offsets = self.column_offsets
+
+        is_own_executor = (
+            executor is None and max_workers is not None and max_workers > 1
+        )
+        if is_own_executor:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            if backend == Indicator_Backend.PANDAS:
+                # pandas backend drops nan, the raw feature length depends on the price
+                raw_feature_list: list[np.ndarray] = _map_concurrently(
+                    lambda f: f.output_raw_feature(normalize=True),
+                    feature_list,
+                    executor,
+                )
+                shortest_feature_length = max(
+                    min(
+                        f.feature_length(raw.shape[-1], f.dimension)
+                        for f, raw in zip(feature_list, raw_feature_list)
+                    ),
+                    0,
+                )
+            else:
+                # numpy backend keeps nan, the layout of the plan gives the length
+                raw_feature_list = None
+                shortest_feature_length = self.output_length(np.shape(price)[-1])
+            # Allocate the output once, trimmed to the shortest feature
+            if tail is not None:
+                shortest_feature_length = min(shortest_feature_length, tail)
+            new_feature_data = np.empty(
+                np.shape(price)[:-1] + (shortest_feature_length, self.output_width),
+                dtype=self.dtype,
+            )
+
+            def _output_feature_into_columns(i: int) -> None:
+                # each feature writes straight into its own column slice, in any order
+                out = new_feature_data[..., column_offsets[i] : column_offsets[i + 1]]
+                if raw_feature_list is None:
+                    feature_list[i].output_feature_array(normalize=True, out=out)
+                else:
+                    feature_list[i].create_feature_from_raw_data_array(
+                        raw_data_array=raw_feature_list[i],
+                        look_back=feature_list[i].dimension,
+                        out=out,
+                    )
+
+            _map_concurrently(
+                _output_feature_into_columns, range(len(feature_list)), executor
+            )
+        finally:
+            if is_own_executor:
+                executor.shutdown()
+        return new_feature_data
+
+    def run_batch(
+        self,
+        data_matrix: np.ndarray,
+        max_workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> np.ndarray:
+        """Create feature tensor from many equal length data vectors in one vectorized pass
+            indicators are calculated along the time axis with the NUMPY backend
+
+        Args:
+            data_matrix (np.ndarray): [scenario x candle] data e.g. close price of each scenario
+            max_workers (Optional[int], optional): calculate features concurrently in a thread pool
+                of this size. Defaults to None.
+            executor (Optional[Executor], optional): executor to calculate features concurrently,
+                takes precedence over max_workers. Defaults to None.
+
+        Returns:
+            np.ndarray: [scenario x N x output_width] feature tensor
+        """
+        data_matrix = np.asarray(data_matrix, dtype=np.float64)
+        if data_matrix.ndim != 2:
+            raise ValueError(
+                f"Expect [scenario x candle] data matrix, got shape {data_matrix.shape}"
+            )
+        return self._output_feature_data(
+            price=data_matrix,
+            backend=Indicator_Backend.NUMPY,
+            max_workers=max_workers,
+            executor=executor,
+        )
+
+    def run(
+        self,
+        data_vector: pd.Series,
+        max_workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        tail: Optional[int] = None,
+    ) -> Feature_Output:
+        """Create feature vectors from 1 dimension data vector
+
+        Args:
+            data_vector (pd.Series): One dimension data vector e.g. close price, volume
+            tail (Optional[int], optional): output the latest tail rows only, calculated over
+                the minimal tail of data_vector, 1 for live inference. Defaults to None.
+            max_workers (Optional[int], optional): calculate features concurrently in a thread pool
+                of this size, the output is identical to the serial run. Defaults to None.
+            executor (Optional[Executor], optional): executor to calculate features concurrently,
+                takes precedence over max_workers. Defaults to None.
+
+        Returns:
+            Feature_Output: Feature output data
+        """
+        if tail is not None:
+            data_vector = price_tail(data_vector, self.tail_length(tail))
+        time_index = data_vector.index
+        price = (
+            data_vector.to_numpy()
+            if self.backend == Indicator_Backend.NUMPY
+            else data_vector
+        )
+        new_feature_data = self._output_feature_data(
+            price=price,
+            backend=self.backend,
+            max_workers=max_workers,
+            executor=executor,
+            tail=tail,
+        )
+        shortest_feature_length = len(new_feature_data)
+        new_time_index = time_index[len(time_index) - shortest_feature_length :]
+
+        return Feature_Output(
+            metadata=self.feature_schema_list,
+            time_index=new_time_index,
+            feature_data=new_feature_data,
+        )
+
+
+def create_feature_from_two_dim_data(
+    data_matrix: np.ndarray,
+    feature_schema_list: list[Feature_Definition],
+    dtype: DTypeLike = np.float64,
+    max_workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> np.ndarray:
+    """Create feature tensor from many equal length data vectors at once
+
+    Args:
+        data_matrix (np.ndarray): [scenario x candle] data e.g. close price of each scenario
+        feature_schema_list (list[Feature_Definition]): feature to aggregate
+        dtype (DTypeLike, optional): floating dtype of the feature data. Defaults to np.float64.
+        max_workers (Optional[int], optional): calculate features concurrently in a thread pool
+            of this size. Defaults to None.
+        executor (Optional[Executor], optional): executor to calculate features concurrently,
+            takes precedence over max_workers. Defaults to None.
+
+    Returns:
+        np.ndarray: [scenario x N x (accm of feature dimension)] feature tensor,
+            row i of each scenario is the same as create_feature_from_one_dim_data_v2
+    """
+    feature_plan = Feature_Plan(
+        feature_schema_list=feature_schema_list,
+        backend=Indicator_Backend.NUMPY,
+        dtype=dtype,
+    )
+    return feature_plan.run_batch(
+        data_matrix=data_matrix, max_workers=max_workers, executor=executor
+    )
+
+
 def create_feature_from_one_dim_data_v2(
-    data_vector: pd.Series, feature_schema_list: list[Feature_Definition]
+    data_vector: pd.Series,
+    feature_schema_list: list[Feature_Definition],
+    backend: Indicator_Backend = Indicator_Backend.PANDAS,
+    dtype: DTypeLike = np.float64,
+    max_workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    tail: Optional[int] = None,
 ) -> Feature_Output:
     """Create feature vectors from 1 dimension data vector
 
     Args:
         data_vector (pd.Series): One dimension data vector e.g. close price, volume
         feature_schema_list (list[Feature_Definition]): feature to aggregate
+        backend (Indicator_Backend, optional): NUMPY calculates indicators on the
+            values of data_vector without pandas Series. Defaults to Indicator_Backend.PANDAS.
+        dtype (DTypeLike, optional): floating dtype of the feature data e.g. np.float32,
+            features are cast before grouping so no extra copy is made. Defaults to np.float64.
+        max_workers (Optional[int], optional): calculate features concurrently in a thread pool
+            of this size, the output is identical to the serial run. Defaults to None.
+        executor (Optional[Executor], optional): executor to calculate features concurrently,
+            takes precedence over max_workers. Defaults to None.
+        tail (Optional[int], optional): output the latest tail rows only, calculated over
+            the minimal tail of data_vector, 1 for live inference. Defaults to None.
 
     Returns:
         Feature_Output: Feature output data
     """
-    time_index = data_vector.index
+    feature_plan = Feature_Plan(
+        feature_schema_list=feature_schema_list, backend=backend, dtype=dtype
+    )
+    return feature_plan.run(
+        data_vector=data_vector, max_workers=max_workers, executor=executor, tail=tail
+    )
 
-    feature_output_list: list[np.ndarray] = []
-    for f_def in feature_schema_list:
-        # initialize feature instance from namedtuple
-        feature = _initialize_price_feature_instance(nt=f_def.data, price=data_vector)
-        feature_array = feature.output_feature_array(normalize=True)
-        feature_output_list.append(feature_array)
 
-    new_feature_data, new_time_index = _trim_feature_to_same_length_and_group(
-        feature_data_list=feature_output_list, time_index=time_index
+def get_feature_cache_key(
+    data_vector: pd.Series,
+    feature_schema_list: list[Feature_Definition],
+    backend: Indicator_Backend = Indicator_Backend.PANDAS,
+    dtype: DTypeLike = np.float64,
+) -> str:
+    """Content hash of the feature output, same data and schema give the same key
+
+    Args:
+        data_vector (pd.Series): One dimension data vector e.g. close price, volume
+        feature_schema_list (list[Feature_Definition]): feature to aggregate
+        backend (Indicator_Backend, optional): indicator backend. Defaults to Indicator_Backend.PANDAS.
+        dtype (DTypeLike, optional): floating dtype of the feature data. Defaults to np.float64.
+
+    Returns:
+        str: hex digest key
+    """
+    # canonical schema: meta and feature params, independent of dict order
+    schema = _feature_metadata_to_json(feature_schema_list)
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(np.ascontiguousarray(data_vector.to_numpy(dtype=np.float64)))
+    hasher.update(
+        np.ascontiguousarray(pd.util.hash_pandas_object(data_vector.index).to_numpy())
     )
+    hasher.update(json.dumps(schema, sort_keys=True, default=str).encode())
+    hasher.update(
+        f"{Indicator_Backend(backend).value}|{validate_feature_dtype(dtype).str}".encode()
+    )
+    return hasher.hexdigest()
+
+
+def create_feature_from_one_dim_data_with_cache(
+    data_vector: pd.Series,
+    feature_schema_list: list[Feature_Definition],
+    feature_cache: FeatureCacheStorage,
+    backend: Indicator_Backend = Indicator_Backend.PANDAS,
+    dtype: DTypeLike = np.float64,
+    max_workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> Feature_Output:
+    """Create feature vectors from 1 dimension data vector through an on-disk cache
+        the feature data is loaded memory-mapped when the same data vector and
+        feature schema were calculated before, otherwise calculated and cached
+
+    Args:
+        data_vector (pd.Series): One dimension data vector e.g. close price, volume
+        feature_schema_list (list[Feature_Definition]): feature to aggregate
+        feature_cache (FeatureCacheStorage): cache storage of feature data
+        backend (Indicator_Backend, optional): indicator backend. Defaults to Indicator_Backend.PANDAS.
+        dtype (DTypeLike, optional): floating dtype of the feature data. Defaults to np.float64.
+        max_workers (Optional[int], optional): calculate features concurrently in a thread pool
+            of this size on cache miss. Defaults to None.
+        executor (Optional[Executor], optional): executor to calculate features concurrently
+            on cache miss, takes precedence over max_workers. Defaults to None.
 
+    Returns:
+        Feature_Output: Feature output data
+    """
+    key = get_feature_cache_key(
+        data_vector=data_vector,
+        feature_schema_list=feature_schema_list,
+        backend=backend,
+        dtype=dtype,
+    )
+    feature_data = feature_cache.load(key)
+    if feature_data is None:
+        feature_output = create_feature_from_one_dim_data_v2(
+            data_vector=data_vector,
+            feature_schema_list=feature_schema_list,
+            backend=backend,
+            dtype=dtype,
+            max_workers=max_workers,
+            executor=executor,
+        )
+        feature_cache.save(key, feature_output.feature_data)
+        return feature_output
+    # feature rows are always the latest rows of data vector
+    time_index = data_vector.index
     return Feature_Output(
         metadata=feature_schema_list,
-        time_index=new_time_index,
-        feature_data=new_feature_data,
+        time_index=time_index[len(time_index) - len(feature_data) :],
+        feature_data=feature_data,
+    )
+
+
+def create_feature_from_one_dim_data_by_timeframe(
+    data_vector: pd.Series,
+    base_timeframe: str,
+    feature_schema_by_timeframe: dict[str, list[Feature_Definition]],
+    backend: Indicator_Backend = Indicator_Backend.PANDAS,
+    dtype: DTypeLike = np.float64,
+) -> Feature_Output:
+    """Create multi-timeframe feature from one base timeframe data vector in one pass
+        each coarser timeframe is resampled incrementally from the lower one, its features
+        are known at the close of the candle and aligned backward to the base time index,
+        so no row sees a candle that has not closed yet
+
+    Args:
+        data_vector (pd.Series): base timeframe data vector indexed by candle open time
+        base_timeframe (str): timeframe of data_vector e.g. 15Min
+        feature_schema_by_timeframe (dict[str, list[Feature_Definition]]): feature to
+            aggregate of each timeframe e.g. {"15Min": [...], "1H": [...], "4H": [...]}
+        backend (Indicator_Backend, optional): indicator backend. Defaults to Indicator_Backend.PANDAS.
+        dtype (DTypeLike, optional): floating dtype of the feature data. Defaults to np.float64.
+
+    Returns:
+        Feature_Output: feature output on the base time index, metadata and columns
+            follow the order of feature_schema_by_timeframe
+    """
+    price_pyramid = resample_price_pyramid(
+        df_price=data_vector,
+        base_timeframe=base_timeframe,
+        timeframes=list(feature_schema_by_timeframe),
+    )
+    feature_output_list = [
+        create_feature_from_one_dim_data_v2(
+            data_vector=price_pyramid[timeframe],
+            feature_schema_list=feature_schema_list,
+            backend=backend,
+            dtype=dtype,
+        )
+        for timeframe, feature_schema_list in feature_schema_by_timeframe.items()
+    ]
+    return Feature_Output.merge_feature_output_list(
+        feature_output_list=feature_output_list,
+        dtype=dtype,
+        alignment=Time_Alignment_Enum.BACKWARD,
+        time_index=data_vector.index,
     )
 
 
+def create_feature_from_one_dim_data_by_time_range(
+    data_vector: pd.Series,
+    feature_schema_list: list[Feature_Definition],
+    time_ranges: list[tuple],
+    **kwargs,
+) -> list[Feature_Output]:
+    """Create feature of each time range (scenario) from one continuous data vector
+        features are calculated once over the whole data vector, each scenario is a view
+        into the same feature data and its warm-up comes from the preceding data
+
+    Args:
+        data_vector (pd.Series): continuous one dimension data vector with time index
+        feature_schema_list (list[Feature_Definition]): feature to aggregate
+        time_ranges (list[tuple]): list of (start, end) time range, both inclusive
+            e.g. from splitting_training_and_eval_time_range
+        **kwargs: passed to create_feature_from_one_dim_data_v2 e.g. backend, dtype
+
+    Returns:
+        list[Feature_Output]: feature output of each time range
+    """
+    feature_output = create_feature_from_one_dim_data_v2(
+        data_vector=data_vector, feature_schema_list=feature_schema_list, **kwargs
+    )
+    return [feature_output.slice_time_range(start, end) for start, end in time_ranges]
+
+
+def create_feature_from_one_dim_data_by_chunk(
+    data_vector: pd.Series,
+    feature_schema_list: list[Feature_Definition],
+    chunk_size: int,
+    backend: Indicator_Backend = Indicator_Backend.PANDAS,
+    dtype: DTypeLike = np.float64,
+) -> Iterator[Feature_Output]:
+    """Create feature of a long data vector chunk by chunk, e.g. to write each chunk to disk
+        each chunk carries a halo of the preceding warm-up rows, running sums of SMA and RSI
+        are carried between chunks, so the concatenated chunks are bit-identical to
+        create_feature_from_one_dim_data_v2 and memory is bounded by the chunk size
+
+    Args:
+        data_vector (pd.Series): One dimension data vector without NaN e.g. close price
+        feature_schema_list (list[Feature_Definition]): feature to aggregate
+        chunk_size (int): number of feature rows of each chunk
+        backend (Indicator_Backend, optional): indicator backend. Defaults to Indicator_Backend.PANDAS.
+        dtype (DTypeLike, optional): floating dtype of the feature data. Defaults to np.float64.
+
+    Yields:
+        Iterator[Feature_Output]: feature output of each chunk in time order
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be positive: {chunk_size}")
+    feature_plan = Feature_Plan(
+        feature_schema_list=feature_schema_list, backend=backend, dtype=dtype
+    )
+    values = data_vector.to_numpy(dtype=np.float64)
+    if np.isnan(values).any():
+        raise ValueError("Chunked feature needs data vector without NaN")
+    length = len(values)
+    warm_up_length = feature_plan.warm_up_length
+    look_behind_length = feature_plan.look_behind_length
+    is_prefix_sum_needed = ("prefix_sum", ()) in feature_plan.indicators
+    rsi_calculator_list = [
+        Rsi_Chunk_Calculator(window=params[0], length=length)
+        for indicator, params in feature_plan.indicators
+        if indicator == "rsi"
+    ]
+
+    prefix_sum: Optional[Prefix_Sum] = None
+    prefix_sum_start = 0
+    # index of the first feature row of the chunk in data vector
+    start = warm_up_length
+    while start < length:
+        end = min(start + chunk_size, length)
+        # halo of the rows the first feature row reads, RSI starts from a block boundary
+        # of its running sum
+        rsi_start_list = [
+            c.get_aligned_start(start - warm_up_length) for c in rsi_calculator_list
+        ]
+        chunk_start = max(
+            min([start - look_behind_length] + [i - 1 for i in rsi_start_list]), 0
+        )
+        chunk_values = values[chunk_start:end]
+        chunk_price = (
+            chunk_values
+            if feature_plan.backend == Indicator_Backend.NUMPY
+            else data_vector.iloc[chunk_start:end]
+        )
+
+        # stateful indicators of the chunk, features take them from the cache
+        indicator_cache = Indicator_Cache()
+        if is_prefix_sum_needed:
+            prefix_sum = calculate_prefix_sum(
+                chunk_values,
+                initial=(
+                    None
+                    if prefix_sum is None
+                    else get_prefix_sum_at(prefix_sum, chunk_start - prefix_sum_start)
+                ),
+            )
+            prefix_sum_start = chunk_start
+            indicator_cache.get_or_calculate(
+                df_price=chunk_price,
+                indicator="prefix_sum",
+                params=(),
+                calculate=lambda: prefix_sum,
+            )
+        for rsi_calculator, rsi_start in zip(rsi_calculator_list, rsi_start_list):
+            rsi = rsi_calculator.calculate(
+                chunk_values, offset=chunk_start, start=rsi_start
+            )
+            indicator_cache.get_or_calculate(
+                df_price=chunk_price,
+                indicator="rsi",
+                params=(rsi_calculator.window,),
+                calculate=lambda: rsi,
+            )
+
+        feature_data = feature_plan._output_feature_data(
+            price=chunk_price,
+            backend=feature_plan.backend,
+            tail=end - start,
+            indicator_cache=indicator_cache,
+        )
+        yield Feature_Output(
+            metadata=feature_schema_list,
+            time_index=data_vector.index[end - len(feature_data) : end],
+            feature_data=feature_data,
+        )
+        start = end
+
+
+class Streaming_Feature_Engine:
+    """Stateful feature engine for live data
+    It takes one new candle at a time and outputs the latest feature row,
+    same as the last row of create_feature_from_one_dim_data_v2 after warm-up
+    """
+
+    def __init__(self, feature_schema_list: list[Feature_Definition]) -> None:
+        """initialize streaming feature engine
+
+        Args:
+            feature_schema_list (list[Feature_Definition]): feature to aggregate
+        """
+        self.feature_schema_list = feature_schema_list
+        self.features: list[Streaming_Feature] = [
+            _initialize_streaming_feature_instance(nt=f_def.data)
+            for f_def in feature_schema_list
+        ]
+        self.feature_length: int = sum(f.dimension for f in self.features)
+
+    def update(self, data: float) -> Optional[np.ndarray]:
+        """update all features with a new candle
+
+        Args:
+            data (float): One dimension data of the new candle e.g. close price, volume
+
+        Returns:
+            Optional[np.ndarray]: latest feature row, None if features are still warming up
+        """
+        for feature in self.features:
+            feature.update(data)
+        return self.output_feature_row()
+
+    def warm_up(self, data_vector: pd.Series) -> Optional[np.ndarray]:
+        """feed historical data to the engine
+
+        Args:
+            data_vector (pd.Series): historical data vector in time order
+
+        Returns:
+            Optional[np.ndarray]: latest feature row, None if features are still warming up
+        """
+        for data in data_vector.values:
+            for feature in self.features:
+                feature.update(data)
+        return self.output_feature_row()
+
+    @property
+    def is_ready(self) -> bool:
+        return all(f.is_ready for f in self.features)
+
+    def output_feature_row(self) -> Optional[np.ndarray]:
+        """output latest feature row
+
+        Returns:
+            Optional[np.ndarray]: [accm of feature dimension] normalized feature row
+        """
+        if not self.is_ready:
+            return None
+        return np.concatenate(
+            [f.output_feature_row(normalize=True) for f in self.features]
+        )
+
+
 def create_feature_from_one_dim_data(
     price_vector: pd.Series, feature_list: list[Feature_Definition]
 ) -> tuple[np.ndarray, np.array]:
@@ -16,6 +16,11 @@ class Training_Eval_Enum(str, Enum):
     EVAL = "eval"
 
 
+class Time_Alignment_Enum(str, Enum):
+    EXACT = "exact"
+    BACKWARD = "backward"
+
+
 @dataclass
 class Feature_Definition:
     meta: dict
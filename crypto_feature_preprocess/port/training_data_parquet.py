@@ -1,7 +1,16 @@
 from cryptomarketdata.port.db_client import get_data_db_client, Database_Type
 from cryptomarketdata.utility import resample_timeframe
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime, timedelta
-from ..domains.training_data import splitting_training_and_eval_time_range
+import functools
+import multiprocessing
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, Optional
+from ..domains.training_data import generate_time_range_with_split
+from ..domains.features_gen import get_timeframe_timedelta
 import pandas as pd
 from ..adapter.TrainingDataStorage import TrainingDataStorage
 import os
@@ -23,6 +32,265 @@ def derive_min_candle_population_in_episode(
     return min_candle_population
 
 
+def _to_time_ms(date_time: datetime) -> int:
+    # convert datetime to int in ms
+    return int(date_time.timestamp() * 1000)
+
+
+def slice_candles_by_time_ms(
+    candles: pd.DataFrame, from_time: int, to_time: int
+) -> pd.DataFrame:
+    """Candles of time range [from_time, to_time] from candles sorted by time index,
+        same range as db_client.get_candles, by binary search without copy
+
+    Args:
+        candles (pd.DataFrame): candles sorted by time index
+        from_time (int): start time in ms, inclusive
+        to_time (int): end time in ms, inclusive
+
+    Returns:
+        pd.DataFrame: candles of the time range
+    """
+    time_index = pd.DatetimeIndex(candles.index)
+    start = time_index.searchsorted(
+        _to_index_timestamp(from_time, time_index), side="left"
+    )
+    end = time_index.searchsorted(_to_index_timestamp(to_time, time_index), side="right")
+    return candles.iloc[start:end]
+
+
+def _to_index_timestamp(time_ms: int, time_index: pd.DatetimeIndex) -> pd.Timestamp:
+    # timestamp comparable with the candle time index
+    return pd.Timestamp(time_ms, unit="ms", tz=None if time_index.tz is None else "UTC")
+
+
+def is_aligned_to_candle_size(
+    start_date: datetime,
+    data_length: timedelta,
+    data_step: timedelta,
+    candle_size: str,
+) -> bool:
+    """Whether every scenario window starts and ends on a candle boundary of a day,
+        then candles resampled once have the same buckets as each window resampled alone.
+        start_date is checked in epoch time as the windows are read, a naive start_date
+        is in the local time zone
+
+    Args:
+        start_date (datetime): start date
+        data_length (timedelta): data length
+        data_step (timedelta): data step
+        candle_size (str): candle size e.g. 15Min, 1H, D
+
+    Returns:
+        bool: True if aligned
+    """
+    try:
+        candle_timedelta = get_timeframe_timedelta(candle_size).to_pytimedelta()
+    except ValueError:
+        return False
+    start_time = timedelta(milliseconds=_to_time_ms(start_date))
+    return all(
+        t % candle_timedelta == timedelta(0)
+        for t in [timedelta(days=1), start_time, data_length, data_step]
+    )
+
+
+class Resampled_Candles:
+    """Candles resampled once for the whole time range, each scenario window is sliced
+    from it instead of resampled again. Buckets fully inside the window are taken from
+    the resampled candles, the last bucket of the window, holding only the candles at
+    the inclusive end time, is resampled once for all windows together.
+    """
+
+    def __init__(
+        self, candles: pd.DataFrame, candle_size: str, end_times: list[int]
+    ) -> None:
+        """resample candles
+
+        Args:
+            candles (pd.DataFrame): candles of all windows sorted by time index
+            candle_size (str): candle size e.g. 15Min, 1H, D
+            end_times (list[int]): end time of each window in ms
+        """
+        self.candle_size = candle_size
+        self.candle_timedelta = get_timeframe_timedelta(candle_size)
+        self.candles_sampled: pd.DataFrame = resample_timeframe(
+            data=candles, tf=candle_size
+        )
+        time_index = pd.DatetimeIndex(candles.index)
+        end_index = pd.DatetimeIndex(
+            [_to_index_timestamp(t, time_index) for t in end_times]
+        )
+        # candles at the end time of each window, in its own bucket of the window
+        self.end_candles_sampled: pd.DataFrame = resample_timeframe(
+            data=candles[time_index.isin(end_index)], tf=candle_size
+        )
+
+    def get_candles_sampled(self, candles: pd.DataFrame, to_time: int) -> pd.DataFrame:
+        """resampled candles of the window, same as resampling the window alone
+
+        Args:
+            candles (pd.DataFrame): candles of the window
+            to_time (int): end time of the window in ms, inclusive
+
+        Returns:
+            pd.DataFrame: resampled candles of the window, a new data frame
+        """
+        time_index = pd.DatetimeIndex(candles.index)
+        end_time = _to_index_timestamp(to_time, time_index)
+        num_candles_before_end = time_index.searchsorted(end_time, side="left")
+        candles_sampled_list = []
+        if num_candles_before_end > 0:
+            # buckets from the first candle to the last candle before the end time
+            first_bucket = time_index[0].floor(self.candle_timedelta)
+            last_bucket = time_index[num_candles_before_end - 1].floor(
+                self.candle_timedelta
+            )
+            candles_sampled_list.append(self.candles_sampled.loc[first_bucket:last_bucket])
+        if num_candles_before_end < len(time_index):
+            candles_sampled_list.append(self.end_candles_sampled.loc[end_time:end_time])
+        if len(candles_sampled_list) == 0:
+            return resample_timeframe(data=candles, tf=self.candle_size)
+        return pd.concat(candles_sampled_list)
+
+
+def _slice_candles_of_time_ranges(
+    candles: pd.DataFrame, time_ranges: list[tuple]
+) -> Iterator[tuple[pd.DataFrame, int]]:
+    # candles of each time range and its end time in ms
+    for _start_date, _end_date in time_ranges:
+        # convert _start_date and _end_date to int in ms
+        _start_date_ms = _to_time_ms(_start_date)
+        _end_date_ms = _to_time_ms(_end_date)
+        yield slice_candles_by_time_ms(
+            candles=candles, from_time=_start_date_ms, to_time=_end_date_ms
+        ), _end_date_ms
+
+
+def _read_candles_by_segment(
+    db_client: Any, symbol: str, from_time: int, to_time: int, segment_length: int
+) -> Iterator[tuple[pd.DataFrame, int]]:
+    # consecutive candles of [from_time, to_time] in segments and the end time in ms
+    segment_from_time = from_time
+    while segment_from_time <= to_time:
+        segment_to_time = min(segment_from_time + segment_length - 1, to_time)
+        candles = db_client.get_candles(
+            symbol=symbol, from_time=segment_from_time, to_time=segment_to_time
+        )
+        if not candles.index.is_monotonic_increasing:
+            candles = candles.sort_index(kind="stable")
+        yield candles, segment_to_time
+        segment_from_time = segment_to_time + 1
+
+
+def _slice_candles_of_time_ranges_from_segments(
+    candle_segments: Iterable[tuple[pd.DataFrame, int]], time_ranges: list[tuple]
+) -> Iterator[tuple[pd.DataFrame, int]]:
+    # candles of each chronological time range from consecutive candle segments,
+    # candles before the time range are dropped from memory
+    candle_segments = iter(candle_segments)
+    candles: pd.DataFrame = pd.DataFrame()
+    loaded_to_time: Optional[int] = None
+    for _start_date, _end_date in time_ranges:
+        _start_date_ms = _to_time_ms(_start_date)
+        _end_date_ms = _to_time_ms(_end_date)
+        while loaded_to_time is None or loaded_to_time < _end_date_ms:
+            segment, loaded_to_time = next(candle_segments)
+            candles = pd.concat([candles, segment]) if len(candles) > 0 else segment
+        candles = slice_candles_by_time_ms(
+            candles=candles, from_time=_start_date_ms, to_time=loaded_to_time
+        )
+        yield slice_candles_by_time_ms(
+            candles=candles, from_time=_start_date_ms, to_time=_end_date_ms
+        ), _end_date_ms
+
+
+def _prefetch(items: Iterable[Any], queue_size: int) -> Iterator[Any]:
+    """Iterate items produced ahead in a background thread
+        at most queue_size items are produced ahead of the consumer
+
+    Args:
+        items (Iterable[Any]): items e.g. candles read from db
+        queue_size (int): number of items produced ahead, 0 to produce in the consumer thread
+
+    Yields:
+        Iterator[Any]: items in order
+    """
+    if queue_size <= 0:
+        yield from items
+        return
+    item_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    is_stopped = threading.Event()
+
+    def _put(entry: tuple) -> bool:
+        # block while the queue is full, until the consumer stops
+        while not is_stopped.is_set():
+            try:
+                item_queue.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in items:
+                if not _put(("item", item)):
+                    return
+            _put(("end", None))
+        except BaseException as e:
+            _put(("error", e))
+
+    producer = threading.Thread(target=_produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, item = item_queue.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise item
+            yield item
+    finally:
+        is_stopped.set()
+        producer.join()
+
+
+def _resample_candles(candles: pd.DataFrame, candle_size: str) -> pd.DataFrame:
+    # module level function to run in process pool
+    return resample_timeframe(data=candles, tf=candle_size)
+
+
+def _map_in_order(
+    function: Callable[[Any], Any],
+    items: Iterable[Any],
+    executor: Optional[Executor] = None,
+    max_pending: int = 1,
+) -> Iterator[Any]:
+    """Map function over items in order, concurrently in the executor
+        at most max_pending items are submitted ahead of the consumer
+
+    Args:
+        function (Callable[[Any], Any]): function of an item
+        items (Iterable[Any]): items
+        executor (Optional[Executor], optional): executor, None to run serially. Defaults to None.
+        max_pending (int, optional): max number of submitted items not consumed. Defaults to 1.
+
+    Yields:
+        Iterator[Any]: result of each item in order of items
+    """
+    if executor is None:
+        yield from map(function, items)
+        return
+    pending: deque[Future] = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
 def prepare_training_data_and_eval_from_parquet(
     exchange: str,
     symbol: str,
@@ -36,6 +304,10 @@ def prepare_training_data_and_eval_from_parquet(
     candle_size: str,
     min_candle_population: int,
     data_type: str = "PARQUET",
+    resample_once: bool = False,
+    workers: int = 1,
+    prefetch_queue_size: int = 0,
+    write_queue_size: int = 0,
 ) -> tuple[int, int]:
     """Prepare training data and eval data from parquet file
        It outputs OHLVC data in parquet file format with schema:
@@ -63,6 +335,18 @@ def prepare_training_data_and_eval_from_parquet(
         candle_size (str): candle size e.g. 15Min, 1H, D
         min_candle_population (int): min candle population
         data_type (Database_Type): data type
+        resample_once (bool, optional): resample the whole time range once and slice each
+            scenario from it, the output is the same as resampling each scenario. It falls
+            back to resampling each scenario if the windows are not aligned to candle_size
+            or the first scenario differs. Defaults to False.
+        workers (int, optional): resample scenarios in a process pool of this size, scenarios
+            are written in order by this process so the output is the same as workers=1.
+            Defaults to 1.
+        prefetch_queue_size (int, optional): read candles in segments of data_length in a
+            background thread, up to this number of segments ahead of the resampling,
+            0 to read all candles at once before resampling. Defaults to 0.
+        write_queue_size (int, optional): write parquet files in a background thread, up to
+            this number of buffers queued, 0 to write in this thread. Defaults to 0.
 
     Returns:
         tuple[int, int]: written training data(num of rows) and eval data(num of rows)
@@ -73,40 +357,120 @@ def prepare_training_data_and_eval_from_parquet(
         database_type=Database_Type(data_type.upper()),
         data_directory=data_directory,
     )
-    # Call domain training data to split training and eval time range
-    training_time_range, eval_time_range = splitting_training_and_eval_time_range(
+    # Call domain training data to split training and eval time range,
+    # all time ranges are processed in one chronological pass
+    time_range_with_split = generate_time_range_with_split(
         start_date=start_date,
         end_date=end_date,
         data_length=data_length,
         split_ratio=split_ratio,
         data_step=data_step,
     )
+    all_time_ranges = [time_range for time_range, _ in time_range_with_split]
+
+    # Read candles of all time ranges once, each scenario is sliced from it
+    all_candles: pd.DataFrame = pd.DataFrame()
+    # resample once needs all candles up front
+    is_prefetching = prefetch_queue_size > 0 and not resample_once
+    if len(all_time_ranges) > 0 and not is_prefetching:
+        all_candles = db_client.get_candles(
+            symbol=symbol,
+            from_time=_to_time_ms(min(r[0] for r in all_time_ranges)),
+            to_time=_to_time_ms(max(r[1] for r in all_time_ranges)),
+        )
+        if not all_candles.index.is_monotonic_increasing:
+            all_candles = all_candles.sort_index(kind="stable")
+        logger.info(f"Read candles: {len(all_candles)}")
 
-    def _save_data_to_storage(data_type: str, time_ranges: list[tuple]) -> int:
-        with TrainingDataStorage(
-            output_folder=os.path.join(output_folder, data_type),
-            buffer_size=10000,
-            datafile_prefix=f"data",
-        ) as data_storage:
-            for i, time_ranges in enumerate(time_ranges):
-                # convert _start_date and _end_date to int in ms
-                # logger.debug(f"Processing {i} data: {time_ranges}")
-                _start_date, _end_date = time_ranges
-                _start_date_ms = int(_start_date.timestamp() * 1000)
-                _end_date_ms = int(_end_date.timestamp() * 1000)
-                # Get  candles
-                candles: pd.Dataframe = db_client.get_candles(
-                    symbol=symbol,
-                    from_time=_start_date_ms,
-                    to_time=_end_date_ms,
+    resampled_candles: Optional[Resampled_Candles] = None
+    if resample_once and len(all_candles) > 0:
+        if is_aligned_to_candle_size(
+            start_date=start_date,
+            data_length=data_length,
+            data_step=data_step,
+            candle_size=candle_size,
+        ):
+            resampled_candles = Resampled_Candles(
+                candles=all_candles,
+                candle_size=candle_size,
+                end_times=[_to_time_ms(r[1]) for r in all_time_ranges],
+            )
+            # Check the first scenario against resampling it alone
+            _start_date_ms, _end_date_ms = [_to_time_ms(t) for t in all_time_ranges[0]]
+            candles = slice_candles_by_time_ms(
+                candles=all_candles, from_time=_start_date_ms, to_time=_end_date_ms
+            )
+            if not resampled_candles.get_candles_sampled(
+                candles=candles, to_time=_end_date_ms
+            ).equals(resample_timeframe(data=candles, tf=candle_size)):
+                logger.warning(
+                    "Resample each scenario, resampled scenario is not the same"
                 )
-                # logger.debug("read Candles: %s", len(candles))
+                resampled_candles = None
+        else:
+            logger.warning(
+                f"Resample each scenario, time range is not aligned to {candle_size}"
+            )
 
-                # Resample training candles
-                candles_sampled: pd.DataFrame = resample_timeframe(
-                    data=candles,
-                    tf=candle_size,
+    def _save_data_to_storage() -> dict[Training_Eval_Enum, int]:
+        with ExitStack() as stack:
+            data_storages: dict[Training_Eval_Enum, TrainingDataStorage] = {
+                data_type: stack.enter_context(
+                    TrainingDataStorage(
+                        output_folder=os.path.join(output_folder, data_type),
+                        buffer_size=10000,
+                        datafile_prefix=f"data",
+                        write_queue_size=write_queue_size,
+                    )
                 )
+                for data_type in [Training_Eval_Enum.TRAINING, Training_Eval_Enum.EVAL]
+            }
+            # scenario id is counted in each of training and eval data
+            scenario_counters = {data_type: 0 for data_type in data_storages}
+            # Candles of each scenario in order, read ahead in segments if prefetching
+            if is_prefetching and len(all_time_ranges) > 0:
+                candles_iter = _slice_candles_of_time_ranges_from_segments(
+                    _prefetch(
+                        _read_candles_by_segment(
+                            db_client=db_client,
+                            symbol=symbol,
+                            from_time=_to_time_ms(all_time_ranges[0][0]),
+                            to_time=_to_time_ms(max(r[1] for r in all_time_ranges)),
+                            segment_length=int(
+                                data_length / timedelta(milliseconds=1)
+                            ),
+                        ),
+                        queue_size=prefetch_queue_size,
+                    ),
+                    all_time_ranges,
+                )
+            else:
+                candles_iter = _slice_candles_of_time_ranges(
+                    all_candles, all_time_ranges
+                )
+            # Resampled candles of each scenario in order, resampled in the process pool
+            if resampled_candles is None:
+                candles_sampled_iter = _map_in_order(
+                    functools.partial(_resample_candles, candle_size=candle_size),
+                    (candles for candles, _ in candles_iter),
+                    executor=executor,
+                    max_pending=2 * workers,
+                )
+            else:
+                candles_sampled_iter = (
+                    resampled_candles.get_candles_sampled(
+                        candles=candles, to_time=_end_date_ms
+                    )
+                    for candles, _end_date_ms in candles_iter
+                )
+            for (_, is_eval), candles_sampled in zip(
+                time_range_with_split, candles_sampled_iter
+            ):
+                data_type = (
+                    Training_Eval_Enum.EVAL if is_eval else Training_Eval_Enum.TRAINING
+                )
+                i = scenario_counters[data_type]
+                scenario_counters[data_type] += 1
 
                 # Filter candles
                 if len(candles_sampled) < min_candle_population:
@@ -116,17 +480,28 @@ def prepare_training_data_and_eval_from_parquet(
 
                 # Save training candles
                 # logger.debug("write Candles: %s", len(candles_sampled))
-                data_storage.save_data(candles_sampled)
-            data_storage.flush()
-            logger.info(f"Written {data_type} data: {data_storage.written_rows}")
-            return data_storage.written_rows
+                data_storages[data_type].save_data(candles_sampled)
+            written_rows = {}
+            for data_type, data_storage in data_storages.items():
+                data_storage.flush()
+                logger.info(f"Written {data_type} data: {data_storage.written_rows}")
+                written_rows[data_type] = data_storage.written_rows
+            return written_rows
         pass
 
-    num_training_rows_written = _save_data_to_storage(
-        data_type=Training_Eval_Enum.TRAINING, time_ranges=training_time_range
-    )
-    num_eval_rows_written = _save_data_to_storage(
-        data_type=Training_Eval_Enum.EVAL, time_ranges=eval_time_range
-    )
+    executor: Optional[Executor] = None
+    if workers > 1 and resampled_candles is None:
+        # spawn workers, the prefetch and writer threads may hold locks at fork
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    try:
+        written_rows = _save_data_to_storage()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    num_training_rows_written = written_rows[Training_Eval_Enum.TRAINING]
+    num_eval_rows_written = written_rows[Training_Eval_Enum.EVAL]
 
     return num_training_rows_written, num_eval_rows_written
@@ -1,5 +1,6 @@
 from crypto_feature_preprocess.domains.training_data import (
     splitting_training_and_eval_time_range,
+    generate_time_range_with_split,
 )
 from datetime import datetime, timedelta
 from crypto_feature_preprocess.logging import get_logger
@@ -32,3 +33,31 @@ def test_splitting_training_and_eval_time_range() -> None:
     assert len(eval_time_range) == num_of_data_vector - num_training_vector
 
     pass
+
+
+def test_generate_time_range_with_split() -> None:
+    start_date = datetime(2021, 1, 1)
+    end_date = datetime(2021, 3, 1)
+    data_length = timedelta(days=7)
+    data_step = timedelta(hours=12)
+
+    time_range_with_split = generate_time_range_with_split(
+        start_date=start_date,
+        end_date=end_date,
+        data_length=data_length,
+        data_step=data_step,
+    )
+    time_ranges = [time_range for time_range, _ in time_range_with_split]
+    # chronological order
+    assert time_ranges == sorted(time_ranges)
+
+    training_time_range, eval_time_range = splitting_training_and_eval_time_range(
+        start_date=start_date,
+        end_date=end_date,
+        data_length=data_length,
+        data_step=data_step,
+    )
+    assert training_time_range == [
+        r for r, is_eval in time_range_with_split if not is_eval
+    ]
+    assert eval_time_range == [r for r, is_eval in time_range_with_split if is_eval]
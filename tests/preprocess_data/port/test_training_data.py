@@ -4,9 +4,28 @@ from crypto_feature_preprocess.logging import get_logger
 from crypto_feature_preprocess.port.training_data_parquet import (
     prepare_training_data_and_eval_from_parquet,
     derive_min_candle_population_in_episode,
+    slice_candles_by_time_ms,
+    is_aligned_to_candle_size,
+    Resampled_Candles,
+    _map_in_order,
+    _prefetch,
+    _slice_candles_of_time_ranges,
+    _slice_candles_of_time_ranges_from_segments,
 )
+from crypto_feature_preprocess.port import training_data_parquet
+from crypto_feature_preprocess.port.interfaces import Training_Eval_Enum
+from crypto_feature_preprocess.domains.training_data import (
+    splitting_training_and_eval_time_range,
+)
+from crypto_feature_preprocess.adapter.TrainingDataStorage import TrainingDataStorage
+from concurrent.futures import ThreadPoolExecutor
+import time
+from cryptomarketdata.utility import resample_timeframe
 from datetime import datetime, timedelta
 
+import numpy as np
+import pandas as pd
+
 import pytest
 import os
 
@@ -64,3 +83,477 @@ def test_prepare_training_data_and_eval_from_parquet() -> None:
     )
     assert num_training_data_row >= min_num_training_data_row
     assert num_eval_data_row >= min_num_eval_data_row
+
+
+class Fake_Db_Client:
+    """in-memory candle database, counts the candle reads"""
+
+    def __init__(self, candles: pd.DataFrame) -> None:
+        self.candles = candles
+        self.read_count: int = 0
+
+    def get_candles(self, symbol: str, from_time: int, to_time: int) -> pd.DataFrame:
+        self.read_count += 1
+        return slice_candles_by_time_ms(
+            candles=self.candles, from_time=from_time, to_time=to_time
+        ).copy()
+
+
+@pytest.fixture()
+def fake_db_client(monkeypatch) -> Fake_Db_Client:
+    time_index = pd.date_range("2019-12-30", "2020-01-25", freq="1min")
+    rng = np.random.default_rng(0)
+    # random gaps and one day without candles, its scenarios are filtered out
+    is_present = (rng.random(len(time_index)) > 0.05) & (
+        (time_index < datetime(2020, 1, 10)) | (time_index >= datetime(2020, 1, 11))
+    )
+    time_index = time_index[is_present]
+    close = 100 + np.cumsum(rng.standard_normal(len(time_index)))
+    candles = pd.DataFrame(
+        {
+            "open": close,
+            "high": close + 1,
+            "low": close - 1,
+            "close": close,
+            "volume": rng.random(len(time_index)),
+        },
+        index=time_index,
+    )
+    db_client = Fake_Db_Client(candles=candles)
+    monkeypatch.setattr(
+        training_data_parquet,
+        "get_data_db_client",
+        lambda exchange, database_type, data_directory: db_client,
+    )
+    return db_client
+
+
+@pytest.fixture(params=["UTC", "Asia/Kolkata"])
+def local_timezone(request, monkeypatch) -> str:
+    # naive datetime is converted to ms in the local time zone
+    with monkeypatch.context() as m:
+        m.setenv("TZ", request.param)
+        time.tzset()
+        yield request.param
+    time.tzset()
+
+
+def _prepare_training_data_by_scenario_read(
+    db_client: Fake_Db_Client, output_folder: str, candle_size: str, **kwargs
+) -> tuple[int, int]:
+    # reference of prepare_training_data_and_eval_from_parquet, reads each scenario
+    training_time_range, eval_time_range = splitting_training_and_eval_time_range(
+        start_date=kwargs["start_date"],
+        end_date=kwargs["end_date"],
+        data_length=kwargs["data_length"],
+        split_ratio=kwargs["split_ratio"],
+        data_step=kwargs["data_step"],
+    )
+    written_rows = []
+    for data_type, time_ranges in [
+        (Training_Eval_Enum.TRAINING, training_time_range),
+        (Training_Eval_Enum.EVAL, eval_time_range),
+    ]:
+        with TrainingDataStorage(
+            output_folder=os.path.join(output_folder, data_type),
+            buffer_size=10000,
+            datafile_prefix="data",
+        ) as data_storage:
+            for i, (start_date, end_date) in enumerate(time_ranges):
+                candles = db_client.get_candles(
+                    symbol=test_symbol,
+                    from_time=int(start_date.timestamp() * 1000),
+                    to_time=int(end_date.timestamp() * 1000),
+                )
+                candles_sampled = resample_timeframe(data=candles, tf=candle_size)
+                if len(candles_sampled) < kwargs["min_candle_population"]:
+                    continue
+                candles_sampled["scenario"] = i
+                data_storage.save_data(candles_sampled)
+            data_storage.flush()
+            written_rows.append(data_storage.written_rows)
+    return written_rows[0], written_rows[1]
+
+
+def _prepare_training_data(
+    output_folder: str, candle_size: str, **kwargs
+) -> tuple[int, int]:
+    return prepare_training_data_and_eval_from_parquet(
+        exchange=test_exchange,
+        symbol=test_symbol,
+        data_directory=test_data_dir,
+        output_folder=output_folder,
+        candle_size=candle_size,
+        **kwargs,
+    )
+
+
+def _assert_same_training_data(output_folder: str, ref_output_folder: str) -> None:
+    for data_type in [Training_Eval_Enum.TRAINING, Training_Eval_Enum.EVAL]:
+        filenames = sorted(os.listdir(os.path.join(output_folder, data_type)))
+        ref_filenames = sorted(os.listdir(os.path.join(ref_output_folder, data_type)))
+        assert len(filenames) > 0
+        assert filenames == ref_filenames
+        for filename in filenames:
+            pd.testing.assert_frame_equal(
+                pd.read_parquet(os.path.join(output_folder, data_type, filename)),
+                pd.read_parquet(os.path.join(ref_output_folder, data_type, filename)),
+            )
+
+
+TRAINING_DATA_PARAMS: dict = dict(
+    start_date=datetime(2020, 1, 1),
+    end_date=datetime(2020, 1, 21),
+    data_length=timedelta(days=2),
+    data_step=timedelta(hours=7),
+    split_ratio=0.8,
+    min_candle_population=150,
+)
+
+
+def test_prepare_training_data_reads_candles_once(
+    fake_db_client, local_timezone, tmp_path
+) -> None:
+    ref_written_rows = _prepare_training_data_by_scenario_read(
+        db_client=fake_db_client,
+        output_folder=str(tmp_path / "ref"),
+        candle_size="15Min",
+        **TRAINING_DATA_PARAMS,
+    )
+    # one read per scenario
+    assert fake_db_client.read_count > 50
+
+    fake_db_client.read_count = 0
+    written_rows = _prepare_training_data(
+        output_folder=str(tmp_path / "output"),
+        candle_size="15Min",
+        **TRAINING_DATA_PARAMS,
+    )
+    assert fake_db_client.read_count == 1
+    assert written_rows == ref_written_rows
+    _assert_same_training_data(str(tmp_path / "output"), str(tmp_path / "ref"))
+
+
+@pytest.mark.parametrize(
+    "candle_size, min_candle_population",
+    # 2h is not aligned to the 7h step, it falls back to resampling each scenario
+    [("15Min", 150), ("1h", 40), ("2h", 18)],
+)
+def test_prepare_training_data_resample_once(
+    fake_db_client,
+    local_timezone,
+    monkeypatch,
+    tmp_path,
+    candle_size,
+    min_candle_population,
+) -> None:
+    params = dict(TRAINING_DATA_PARAMS, min_candle_population=min_candle_population)
+    if local_timezone == "Asia/Kolkata" and candle_size == "1h":
+        # local midnight is at :30 in UTC, start the windows on the hour
+        params["start_date"] = params["start_date"] + timedelta(minutes=30)
+    is_aligned = is_aligned_to_candle_size(
+        start_date=params["start_date"],
+        data_length=params["data_length"],
+        data_step=params["data_step"],
+        candle_size=candle_size,
+    )
+    assert is_aligned == (candle_size != "2h")
+    written_rows = _prepare_training_data(
+        output_folder=str(tmp_path / "output"), candle_size=candle_size, **params
+    )
+
+    resample_count = 0
+
+    def _counting_resample_timeframe(data: pd.DataFrame, tf: str) -> pd.DataFrame:
+        nonlocal resample_count
+        resample_count += 1
+        return resample_timeframe(data=data, tf=tf)
+
+    monkeypatch.setattr(
+        training_data_parquet, "resample_timeframe", _counting_resample_timeframe
+    )
+    resample_once_written_rows = _prepare_training_data(
+        output_folder=str(tmp_path / "resample_once"),
+        candle_size=candle_size,
+        resample_once=True,
+        **params,
+    )
+    assert resample_once_written_rows == written_rows
+    # whole time range and the first scenario only, each of 62 scenarios on fallback
+    assert (resample_count < 62) == is_aligned
+    _assert_same_training_data(
+        str(tmp_path / "resample_once"), str(tmp_path / "output")
+    )
+
+
+def test_prepare_training_data_in_process_pool(fake_db_client, tmp_path) -> None:
+    written_rows = _prepare_training_data(
+        output_folder=str(tmp_path / "output"),
+        candle_size="15Min",
+        **TRAINING_DATA_PARAMS,
+    )
+    # with the prefetch reader and the background writers running
+    for prefetch_queue_size, write_queue_size in [(0, 0), (2, 2)]:
+        output_folder = str(tmp_path / f"process_pool_{prefetch_queue_size}")
+        process_pool_written_rows = _prepare_training_data(
+            output_folder=output_folder,
+            candle_size="15Min",
+            workers=2,
+            prefetch_queue_size=prefetch_queue_size,
+            write_queue_size=write_queue_size,
+            **TRAINING_DATA_PARAMS,
+        )
+        assert process_pool_written_rows == written_rows
+        _assert_same_training_data(output_folder, str(tmp_path / "output"))
+
+
+def test_prepare_training_data_with_prefetch(fake_db_client, tmp_path) -> None:
+    written_rows = _prepare_training_data(
+        output_folder=str(tmp_path / "output"),
+        candle_size="15Min",
+        **TRAINING_DATA_PARAMS,
+    )
+    for prefetch_queue_size, write_queue_size in [(1, 0), (3, 2)]:
+        fake_db_client.read_count = 0
+        output_folder = str(tmp_path / f"prefetch_{prefetch_queue_size}")
+        prefetch_written_rows = _prepare_training_data(
+            output_folder=output_folder,
+            candle_size="15Min",
+            prefetch_queue_size=prefetch_queue_size,
+            write_queue_size=write_queue_size,
+            **TRAINING_DATA_PARAMS,
+        )
+        # candles are read in segments of data_length
+        assert fake_db_client.read_count > 1
+        assert prefetch_written_rows == written_rows
+        _assert_same_training_data(output_folder, str(tmp_path / "output"))
+
+
+def test_prepare_training_data_write_error(
+    fake_db_client, monkeypatch, tmp_path
+) -> None:
+    def _failing_to_parquet(*args, **kwargs) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", _failing_to_parquet)
+    with pytest.raises(OSError, match="disk full"):
+        _prepare_training_data(
+            output_folder=str(tmp_path / "output"),
+            candle_size="15Min",
+            write_queue_size=2,
+            **TRAINING_DATA_PARAMS,
+        )
+
+
+def test_slice_candles_by_time_ms() -> None:
+    time_index = pd.date_range("2020-01-01", periods=1000, freq="1min")
+    candles = pd.DataFrame({"close": np.arange(len(time_index))}, index=time_index)
+    from_time = int(pd.Timestamp("2020-01-01 01:00").timestamp() * 1000)
+    to_time = int(pd.Timestamp("2020-01-01 02:00").timestamp() * 1000)
+
+    sliced_candles = slice_candles_by_time_ms(
+        candles=candles, from_time=from_time, to_time=to_time
+    )
+    # both ends are inclusive
+    assert len(sliced_candles) == 61
+    assert sliced_candles.index[0] == pd.Timestamp("2020-01-01 01:00")
+    assert sliced_candles.index[-1] == pd.Timestamp("2020-01-01 02:00")
+    assert len(slice_candles_by_time_ms(candles, from_time=0, to_time=1)) == 0
+
+
+def test_resampled_candles() -> None:
+    time_index = pd.date_range("2020-01-01", "2020-01-10", freq="1min")
+    # gaps in the candles
+    time_index = time_index[np.sin(np.arange(len(time_index))) < 0.9]
+    close = 100 + np.cumsum(np.sin(np.arange(len(time_index)) / 50))
+    candles = pd.DataFrame(
+        {"open": close, "high": close, "low": close, "close": close, "volume": 1.0},
+        index=time_index,
+    )
+    start_date = datetime(2020, 1, 1)
+    window_starts = [start_date + i * timedelta(hours=5) for i in range(20)]
+    time_ranges = [(start, start + timedelta(days=2)) for start in window_starts]
+    assert is_aligned_to_candle_size(
+        start_date=start_date,
+        data_length=timedelta(days=2),
+        data_step=timedelta(hours=5),
+        candle_size="15Min",
+    )
+    assert not is_aligned_to_candle_size(
+        start_date=start_date,
+        data_length=timedelta(days=2),
+        data_step=timedelta(hours=5),
+        candle_size="2H",
+    )
+    # start time is checked in epoch time, not the time of day of start_date
+    assert not is_aligned_to_candle_size(
+        start_date=datetime.fromtimestamp(30 * 60),
+        data_length=timedelta(days=2),
+        data_step=timedelta(hours=5),
+        candle_size="1H",
+    )
+
+    def to_time_ms(date_time: datetime) -> int:
+        return int(date_time.timestamp() * 1000)
+
+    resampled_candles = Resampled_Candles(
+        candles=candles,
+        candle_size="15Min",
+        end_times=[to_time_ms(end) for _, end in time_ranges],
+    )
+    for start, end in time_ranges:
+        window_candles = slice_candles_by_time_ms(
+            candles=candles, from_time=to_time_ms(start), to_time=to_time_ms(end)
+        )
+        assert resampled_candles.get_candles_sampled(
+            candles=window_candles, to_time=to_time_ms(end)
+        ).equals(resample_timeframe(data=window_candles, tf="15Min"))
+
+
+def test_map_in_order() -> None:
+    def _delayed_square(x: int) -> int:
+        # later items finish first
+        time.sleep((10 - x) / 1000)
+        return x * x
+
+    consumed: list[int] = []
+
+    def _items():
+        for x in range(10):
+            # never more than max_pending items ahead of the consumer
+            assert x - len(consumed) <= 3
+            yield x
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for result in _map_in_order(
+            _delayed_square, _items(), executor=executor, max_pending=3
+        ):
+            consumed.append(result)
+    assert consumed == [x * x for x in range(10)]
+    assert list(_map_in_order(_delayed_square, range(3))) == [0, 1, 4]
+
+    def _failing_square(x: int) -> int:
+        if x == 5:
+            raise ValueError("resample failed")
+        return _delayed_square(x)
+
+    # results before the failing item are in order, then its error is raised
+    consumed = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        with pytest.raises(ValueError, match="resample failed"):
+            for result in _map_in_order(
+                _failing_square, range(10), executor=executor, max_pending=3
+            ):
+                consumed.append(result)
+    assert consumed == [x * x for x in range(5)]
+
+
+def test_prefetch() -> None:
+    produced: list[int] = []
+
+    def _items():
+        for x in range(20):
+            produced.append(x)
+            yield x
+
+    for x in _prefetch(_items(), queue_size=3):
+        time.sleep(0.001)
+        # bounded by the queue, the item held by the producer and the consumed item
+        assert len(produced) <= x + 1 + 3 + 1
+    assert produced == list(range(20))
+
+    def _failing_items():
+        yield 1
+        raise ValueError("read failed")
+
+    with pytest.raises(ValueError):
+        list(_prefetch(_failing_items(), queue_size=2))
+
+
+def test_slice_candles_from_segments() -> None:
+    time_index = pd.date_range("2020-01-01", "2020-01-20", freq="1min")
+    candles = pd.DataFrame({"close": np.arange(len(time_index))}, index=time_index)
+    window_starts = [datetime(2020, 1, 1) + i * timedelta(hours=7) for i in range(40)]
+    time_ranges = [(start, start + timedelta(days=3)) for start in window_starts]
+
+    def to_time_ms(date_time: datetime) -> int:
+        return int(date_time.timestamp() * 1000)
+
+    segment_length = 5 * 3600 * 1000
+    from_time, to_time = to_time_ms(time_ranges[0][0]), to_time_ms(time_ranges[-1][1])
+    segment_from_times = range(from_time, to_time + 1, segment_length)
+    candle_segments = (
+        (
+            slice_candles_by_time_ms(candles, t, t + segment_length - 1),
+            t + segment_length - 1,
+        )
+        for t in segment_from_times
+    )
+    segment_candles_list = list(
+        _slice_candles_of_time_ranges_from_segments(candle_segments, time_ranges)
+    )
+    bulk_candles_list = list(_slice_candles_of_time_ranges(candles, time_ranges))
+    assert len(segment_candles_list) == len(bulk_candles_list) == len(time_ranges)
+    for (segment_candles, segment_end), (bulk_candles, bulk_end) in zip(
+        segment_candles_list, bulk_candles_list
+    ):
+        assert segment_end == bulk_end
+        assert segment_candles.equals(bulk_candles)
+
+
+def test_training_data_storage_background_writer(tmp_path) -> None:
+    data = pd.DataFrame(
+        {"close": np.arange(1000.0)},
+        index=pd.date_range("2020-01-01", periods=1000, freq="1min"),
+    )
+    for write_queue_size in [0, 2]:
+        output_folder = str(tmp_path / f"queue_{write_queue_size}")
+        with TrainingDataStorage(
+            buffer_size=64,
+            datafile_prefix="data",
+            output_folder=output_folder,
+            write_queue_size=write_queue_size,
+        ) as data_storage:
+            for i in range(0, len(data), 50):
+                data_storage.save_data(data.iloc[i : i + 50])
+        assert data_storage.written_rows == len(data)
+        filenames = sorted(os.listdir(output_folder))
+        assert len(filenames) == 10
+        written_data = pd.concat(
+            [
+                pd.read_parquet(os.path.join(output_folder, f"data_{i}.parquet"))
+                for i in range(len(filenames))
+            ]
+        )
+        assert written_data.equals(data)
+
+
+def test_training_data_storage_background_write_error(monkeypatch, tmp_path) -> None:
+    written_filepaths: list[str] = []
+
+    def _failing_to_parquet(self, filepath, *args, **kwargs) -> None:
+        # the second buffer fails
+        if len(written_filepaths) == 1:
+            raise OSError("disk full")
+        written_filepaths.append(filepath)
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", _failing_to_parquet)
+    data = pd.DataFrame(
+        {"close": np.arange(1000.0)},
+        index=pd.date_range("2020-01-01", periods=1000, freq="1min"),
+    )
+    data_storage = TrainingDataStorage(
+        buffer_size=64,
+        datafile_prefix="data",
+        output_folder=str(tmp_path),
+        write_queue_size=2,
+    )
+    # the error of the background writer reaches the caller
+    with pytest.raises(OSError, match="disk full"):
+        with data_storage:
+            for i in range(0, len(data), 50):
+                data_storage.save_data(data.iloc[i : i + 50])
+    # buffers after the failed one are not written, the writer is stopped
+    assert len(written_filepaths) == 1
+    assert data_storage.written_rows == 100
+    assert data_storage._writer is None
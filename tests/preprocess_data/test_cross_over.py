@@ -1,8 +1,28 @@
 # testing for preprocess.domain.features.SMA_Cross_Feature
-from crypto_feature_preprocess.domains.features_gen import SMA_Cross_Feature
-from crypto_feature_preprocess.domains.indicators import calculate_simple_moving_average
-from crypto_feature_preprocess.port.interfaces import SMA_Cross_Feature_Interface
+from crypto_feature_preprocess.domains.features_gen import (
+    Packed_Event_Feature,
+    SMA_Cross_Feature,
+)
+from crypto_feature_preprocess.domains.features_stream import (
+    SMA_Cross_Streaming_Feature,
+)
+from crypto_feature_preprocess.domains.indicators import (
+    Indicator_Backend,
+    calculate_cross_over,
+    calculate_simple_moving_average,
+    calculate_simple_moving_average_bank,
+    calculate_sma_cross_bank,
+)
+from crypto_feature_preprocess.port.features import (
+    create_feature_from_one_dim_data_by_chunk,
+)
+from crypto_feature_preprocess.port.interfaces import (
+    Feature_Definition,
+    Feature_Enum,
+    SMA_Cross_Feature_Interface,
+)
 import numpy as np
+import pandas as pd
 import pytest
 import logging
 
@@ -23,6 +43,19 @@ def test_sma_calcuation(get_test_ascending_mkt_data) -> None:
     assert len(sma_10) == len(close_price) - 10 + 1
 
 
+def test_sma_bank(get_test_decending_then_ascending_mkt_data) -> None:
+    close_price = get_test_decending_then_ascending_mkt_data(dim=300)["close"]
+    close_price = close_price * np.exp(np.sin(np.arange(len(close_price))) / 100)
+    close_price.iloc[150] = np.nan
+    windows = [1, 5, 20, 50, 400]
+    sma_bank = calculate_simple_moving_average_bank(close_price, windows=windows)
+    assert sma_bank.shape == (len(windows), len(close_price))
+    for window, sma in zip(windows, sma_bank):
+        ref_sma = calculate_simple_moving_average(df_price=close_price, window=window)
+        assert (np.isnan(sma) == ref_sma.isna().values).all()
+        assert np.allclose(sma, ref_sma.values, rtol=1e-14, equal_nan=True)
+
+
 def test_sma_cross_over(get_test_decending_then_ascending_mkt_data) -> None:
     length = 16
     close_price = get_test_decending_then_ascending_mkt_data(dim=length)["close"]
@@ -90,3 +123,173 @@ def test_initialization_from_port(get_test_decending_then_ascending_mkt_data) ->
     assert len(sma_feature_array) == num_features
     assert dim == sma_feature_array.shape[1]
     
+
+
+@pytest.mark.parametrize("dimension", [1, 3, 32])
+def test_sma_cross_over_packed(
+    get_test_decending_then_ascending_mkt_data, dimension
+) -> None:
+    close_price = get_test_decending_then_ascending_mkt_data(dim=1000)["close"]
+    close_price = close_price * np.exp(np.sin(np.arange(len(close_price)) / 10) / 10)
+    sma_cross = SMA_Cross_Feature(
+        df_price=close_price, sma_window_1=5, sma_window_2=10, dimension=dimension
+    )
+    sma_cross_features = sma_cross.output_feature_array()
+
+    packed_feature: Packed_Event_Feature = sma_cross.output_packed_feature()
+    assert packed_feature.shape == sma_cross_features.shape
+    # 1 bit per time step instead of dimension float64 per row
+    assert packed_feature.nbytes == (len(sma_cross._calculate()) + 7) // 8
+    assert np.array_equal(packed_feature.to_dense(), sma_cross_features)
+    assert packed_feature.to_dense(dtype=np.float32).dtype == np.float32
+
+    (event_index,) = packed_feature.event_index()
+    assert len(event_index) > 0
+    assert (event_index == np.flatnonzero(sma_cross._calculate())).all()
+
+    # scenarios along the leading axis
+    packed_batch = Packed_Event_Feature.pack(
+        np.stack([sma_cross._calculate()] * 2), dimension=dimension
+    )
+    assert np.array_equal(packed_batch.to_dense()[1], sma_cross_features)
+
+
+def test_sma_cross_bank(get_test_decending_then_ascending_mkt_data) -> None:
+    close_price = get_test_decending_then_ascending_mkt_data(dim=1000)["close"]
+    close_price = close_price * np.exp(np.sin(np.arange(len(close_price)) / 10) / 10)
+    close_price.iloc[500] = np.nan
+    window_pairs = [(5, 10), (10, 5), (3, 20), (20, 50), (5, 50), (7, 2000)]
+    cross_bank = calculate_sma_cross_bank(close_price, window_pairs=window_pairs)
+    assert cross_bank.shape == (len(window_pairs), len(close_price))
+    assert cross_bank.any(axis=-1)[:-1].all()
+    for (sma_window_1, sma_window_2), cross_over in zip(window_pairs, cross_bank):
+        sma_cross = SMA_Cross_Feature(
+            df_price=close_price,
+            sma_window_1=sma_window_1,
+            sma_window_2=sma_window_2,
+            dimension=LOOK_BACK,
+        )
+        ref_cross_over = sma_cross._calculate()
+        assert np.array_equal(
+            cross_over[sma_cross.invalid_data_length :], ref_cross_over
+        )
+
+    # scenarios along the leading axis
+    price_matrix = np.stack([close_price.values, close_price.values[::-1]])
+    cross_bank = calculate_sma_cross_bank(price_matrix, window_pairs=window_pairs)
+    assert cross_bank.shape == (len(window_pairs), 2, len(close_price))
+    assert np.array_equal(
+        cross_bank[:, 1],
+        calculate_sma_cross_bank(price_matrix[1], window_pairs=window_pairs),
+    )
+
+
+def _get_tick_grid_price(seed: int, length: int = 400) -> pd.Series:
+    # 0.1 tick price with long flat runs, the two SMA are often equal
+    steps = np.random.default_rng(seed).choice(
+        [-1, 0, 1], p=[0.1, 0.8, 0.1], size=length
+    )
+    return pd.Series(
+        np.round(2000 + 0.1 * np.cumsum(steps), 1),
+        index=pd.date_range("2020-01-01", periods=length, freq="1min"),
+    )
+
+
+def test_cross_over_tie() -> None:
+    # rounding noise of two equal lines is a tie, not a cross over
+    line_scale = np.full(5, 2000.0)
+    assert not calculate_cross_over(
+        np.array([-1e-13, 1e-13, -1e-13, 2e-13, 0.0]), line_scale=line_scale
+    ).any()
+    assert calculate_cross_over(np.array([-1e-13, 1e-13])).any()
+    # a tie between the two sides is not a cross over
+    assert np.array_equal(
+        calculate_cross_over(np.array([-0.01, 0.0, 0.01, -0.01, 0.01]), line_scale),
+        [False, False, False, False, True],
+    )
+
+
+@pytest.mark.parametrize("sma_window_1, sma_window_2", [(5, 20), (20, 5), (3, 10)])
+def test_sma_cross_over_on_tick_grid(sma_window_1, sma_window_2) -> None:
+    for seed in range(50):
+        close_price = _get_tick_grid_price(seed)
+        sma_cross = SMA_Cross_Feature(
+            df_price=close_price,
+            sma_window_1=sma_window_1,
+            sma_window_2=sma_window_2,
+            dimension=LOOK_BACK,
+        )
+        cross_over = sma_cross._calculate()
+        # pandas rolling mean with the same tie rule
+        sma_1 = close_price.rolling(sma_window_1).mean().values
+        sma_2 = close_price.rolling(sma_window_2).mean().values
+        ref_cross_over = calculate_cross_over(
+            sma_1 - sma_2, line_scale=np.maximum(np.abs(sma_1), np.abs(sma_2))
+        )[sma_cross.invalid_data_length :]
+        assert np.array_equal(cross_over, ref_cross_over)
+
+        numpy_sma_cross = SMA_Cross_Feature(
+            df_price=close_price.values,
+            sma_window_1=sma_window_1,
+            sma_window_2=sma_window_2,
+            dimension=LOOK_BACK,
+            backend=Indicator_Backend.NUMPY,
+        )
+        assert np.array_equal(numpy_sma_cross._calculate(), cross_over)
+        cross_bank = calculate_sma_cross_bank(
+            close_price, window_pairs=[(sma_window_1, sma_window_2)]
+        )
+        assert np.array_equal(
+            cross_bank[0][sma_cross.invalid_data_length :], cross_over
+        )
+
+        # the running sums of streaming have the same ties
+        streaming_sma_cross = SMA_Cross_Streaming_Feature(
+            sma_window_1=sma_window_1, sma_window_2=sma_window_2, dimension=1
+        )
+        streaming_cross_over = []
+        for price in close_price.values:
+            streaming_sma_cross.update(price)
+            if streaming_sma_cross.is_ready:
+                streaming_cross_over.append(streaming_sma_cross.output_feature_row()[0])
+        assert np.array_equal(np.array(streaming_cross_over) == 1, cross_over)
+
+        # chunks carry the prefix sum and read the SMA difference before each chunk
+        feature_schema_list = [
+            Feature_Definition(
+                meta={"name": Feature_Enum.SMA_CROSS},
+                data=SMA_Cross_Feature_Interface(
+                    sma_window_1=sma_window_1,
+                    sma_window_2=sma_window_2,
+                    dimension=LOOK_BACK,
+                ),
+            )
+        ]
+        for backend in Indicator_Backend:
+            chunk_feature_data = np.concatenate(
+                [
+                    f.feature_data
+                    for f in create_feature_from_one_dim_data_by_chunk(
+                        data_vector=close_price,
+                        feature_schema_list=feature_schema_list,
+                        chunk_size=37,
+                        backend=backend,
+                    )
+                ]
+            )
+            assert np.array_equal(chunk_feature_data, sma_cross.output_feature_array())
+
+
+@pytest.mark.parametrize("n", [1, 5])
+def test_sma_cross_over_tail_on_tick_grid(n) -> None:
+    for seed in range(50):
+        sma_cross = SMA_Cross_Feature(
+            df_price=_get_tick_grid_price(seed),
+            sma_window_1=5,
+            sma_window_2=20,
+            dimension=LOOK_BACK,
+        )
+        # the oldest cross of the tail reads the SMA difference before it
+        assert np.array_equal(
+            sma_cross.output_feature_tail(n), sma_cross.output_feature_array()[-n:]
+        )
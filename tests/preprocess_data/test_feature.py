@@ -1,19 +1,36 @@
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
 from crypto_feature_preprocess.port.interfaces import (
     Feature_Definition,
     RSI_Feature_Interface,
     Log_Price_Feature_Interface,
     SMA_Cross_Feature_Interface,
     Feature_Enum,
+    Time_Alignment_Enum,
 )
 import numpy as np
+import os
+import pandas as pd
+from crypto_feature_preprocess.domains.indicators import (
+    Indicator_Backend,
+    Indicator_Cache,
+)
 from crypto_feature_preprocess.port.features import (
     Feature_Output,
     create_feature_from_one_dim_data,
     create_feature_from_one_dim_data_v2,
+    create_feature_from_one_dim_data_by_time_range,
+    create_feature_from_one_dim_data_by_chunk,
+    create_feature_from_one_dim_data_by_timeframe,
+    create_feature_from_one_dim_data_with_cache,
+    get_feature_cache_key,
+    create_feature_from_two_dim_data,
     _initialize_price_feature_instance,
+    Feature_Plan,
+    Streaming_Feature_Engine,
 )
 import pytest
+from crypto_feature_preprocess.adapter.FeatureCacheStorage import FeatureCacheStorage
 from crypto_feature_preprocess.logging import get_logger
 from functools import reduce
 
@@ -300,3 +317,678 @@ def test_feature_merging(
         == volume_feature_output.feature_data[-new_feature_population_size:, :]
     ).all(), "volume feature content is not consistent"
     pass
+
+
+def test_streaming_feature_engine(
+    get_test_decending_then_ascending_mkt_data, get_price_feature_spec
+) -> None:
+    candles = get_test_decending_then_ascending_mkt_data(dim=200)
+    feature_schema_list = get_price_feature_spec
+    one_vector_data = candles["close"]
+
+    feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        feature_schema_list=feature_schema_list,
+        data_vector=one_vector_data,
+    )
+
+    engine = Streaming_Feature_Engine(feature_schema_list=feature_schema_list)
+    feature_rows = []
+    for price in one_vector_data.values:
+        feature_row = engine.update(price)
+        if feature_row is not None:
+            feature_rows.append(feature_row)
+
+    assert engine.feature_length == feature_output.feature_data.shape[1]
+    assert len(feature_rows) == len(feature_output.feature_data)
+    assert np.allclose(np.array(feature_rows), feature_output.feature_data)
+
+    # Warm up from history then stream the last candle
+    engine = Streaming_Feature_Engine(feature_schema_list=feature_schema_list)
+    engine.warm_up(one_vector_data[:-1])
+    feature_row = engine.update(one_vector_data.values[-1])
+    assert np.allclose(feature_row, feature_output.feature_data[-1])
+
+
+def test_indicator_cache_shared_by_features(
+    get_test_decending_then_ascending_mkt_data,
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=200)["close"]
+    interfaces = [
+        SMA_Cross_Feature_Interface(sma_window_1=5, sma_window_2=20, dimension=3),
+        SMA_Cross_Feature_Interface(sma_window_1=20, sma_window_2=50, dimension=3),
+        RSI_Feature_Interface(rsi_window=14, dimension=3),
+        RSI_Feature_Interface(rsi_window=7, dimension=5),
+        Log_Price_Feature_Interface(dimension=5),
+        Log_Price_Feature_Interface(dimension=10),
+    ]
+    indicator_cache = Indicator_Cache()
+    for nt in interfaces:
+        cached_feature = _initialize_price_feature_instance(
+            nt=nt, price=one_vector_data, indicator_cache=indicator_cache
+        )
+        feature = _initialize_price_feature_instance(nt=nt, price=one_vector_data)
+        assert (
+            cached_feature.output_feature_array(normalize=True)
+            == feature.output_feature_array(normalize=True)
+        ).all()
+    # prefix sum, sma 5, 20, 50, up/down move, rsi 14, rsi 7, log price change
+    assert len(indicator_cache) == 8
+
+
+def test_numpy_indicator_backend(
+    get_test_decending_then_ascending_mkt_data, get_price_feature_spec
+) -> None:
+    candle_data = get_test_decending_then_ascending_mkt_data(dim=200)["close"]
+    # random walk, numpy and pandas backends differ by rounding only
+    random_walk_data = pd.Series(
+        20000 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, 1000))),
+        index=pd.date_range("2020-01-01", periods=1000, freq="1h"),
+    )
+    feature_schema_list = get_price_feature_spec + [
+        Feature_Definition(
+            meta={"name": Feature_Enum.RSI},
+            data=RSI_Feature_Interface(rsi_window=7, dimension=LOOK_BACK),
+        ),
+    ]
+
+    for one_vector_data in (candle_data, random_walk_data):
+        for f_def in feature_schema_list:
+            pandas_feature = _initialize_price_feature_instance(
+                nt=f_def.data, price=one_vector_data
+            )
+            numpy_feature = _initialize_price_feature_instance(
+                nt=f_def.data,
+                price=one_vector_data.values,
+                backend=Indicator_Backend.NUMPY,
+            )
+            assert isinstance(numpy_feature._calculate(), np.ndarray)
+            pandas_feature_array = pandas_feature.output_feature_array(normalize=True)
+            numpy_feature_array = numpy_feature.output_feature_array(normalize=True)
+            assert pandas_feature_array.shape == numpy_feature_array.shape
+            assert np.allclose(
+                pandas_feature_array, numpy_feature_array, rtol=1e-9, atol=1e-12
+            )
+
+        pandas_output: Feature_Output = create_feature_from_one_dim_data_v2(
+            data_vector=one_vector_data, feature_schema_list=feature_schema_list
+        )
+        numpy_output: Feature_Output = create_feature_from_one_dim_data_v2(
+            data_vector=one_vector_data,
+            feature_schema_list=feature_schema_list,
+            backend=Indicator_Backend.NUMPY,
+        )
+        assert (pandas_output.time_index == numpy_output.time_index).all()
+        assert pandas_output.feature_data.shape == numpy_output.feature_data.shape
+        assert np.allclose(
+            pandas_output.feature_data,
+            numpy_output.feature_data,
+            rtol=1e-9,
+            atol=1e-12,
+        )
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float16])
+def test_feature_output_dtype(
+    get_test_decending_then_ascending_mkt_data, get_price_feature_spec, dtype
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=200)["close"]
+    feature_schema_list = get_price_feature_spec
+
+    feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=one_vector_data, feature_schema_list=feature_schema_list
+    )
+    typed_feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=one_vector_data,
+        feature_schema_list=feature_schema_list,
+        dtype=dtype,
+    )
+    assert feature_output.dtype == np.float64
+    assert typed_feature_output.dtype == dtype
+    # features are cast once after normalization
+    assert (
+        typed_feature_output.feature_data == feature_output.feature_data.astype(dtype)
+    ).all()
+
+    merged_feature_output = Feature_Output.merge_feature_output_list(
+        [typed_feature_output, typed_feature_output]
+    )
+    assert merged_feature_output.dtype == dtype
+
+    with pytest.raises(ValueError):
+        create_feature_from_one_dim_data_v2(
+            data_vector=one_vector_data,
+            feature_schema_list=feature_schema_list,
+            dtype=np.int32,
+        )
+
+
+def test_feature_output_into_buffer(
+    get_test_decending_then_ascending_mkt_data, get_price_feature_spec
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=200)["close"]
+    # flat price at the start, pandas backend drops 0 / 0 RSI
+    flat_vector_data = one_vector_data.copy()
+    flat_vector_data.iloc[:30] = flat_vector_data.iloc[30]
+
+    for data_vector in (one_vector_data, flat_vector_data):
+        for backend in Indicator_Backend:
+            for f_def in get_price_feature_spec:
+                feature = _initialize_price_feature_instance(
+                    nt=f_def.data, price=data_vector, backend=backend
+                )
+                feature_array = feature.output_feature_array(normalize=True)
+                raw_feature = feature.output_raw_feature(normalize=True)
+                assert len(feature_array) == feature.feature_length(
+                    len(raw_feature), feature.dimension
+                )
+                # output_length is exact for price without nan
+                assert feature.output_length >= len(feature_array)
+                if data_vector is one_vector_data:
+                    assert feature.output_length == len(feature_array)
+
+                out = np.full((len(feature_array) - 5, feature.dimension), np.nan)
+                assert (
+                    feature.output_feature_array(normalize=True, out=out) is out
+                )
+                # numpy backend keeps nan of flat price
+                assert np.array_equal(out, feature_array[5:], equal_nan=True)
+
+    with pytest.raises(ValueError):
+        feature.output_feature_array(
+            out=np.empty((len(feature_array) + 1, feature.dimension))
+        )
+
+
+def test_feature_plan_with_nan_price(get_test_decending_then_ascending_mkt_data) -> None:
+    data_vector = get_test_decending_then_ascending_mkt_data(dim=500)["close"]
+    data_vector.iloc[100] = np.nan
+    feature_schema_list = [
+        Feature_Definition(
+            meta={"name": Feature_Enum.LOG_PRICE},
+            data=Log_Price_Feature_Interface(dimension=LOOK_BACK),
+        ),
+        Feature_Definition(
+            meta={"name": Feature_Enum.RSI},
+            data=RSI_Feature_Interface(rsi_window=3, dimension=2),
+        ),
+    ]
+    # pandas backend drops nan, the feature is shorter than output_length
+    feature_plan = Feature_Plan(feature_schema_list=feature_schema_list)
+    ref_feature_data, _ = create_feature_from_one_dim_data(
+        price_vector=data_vector, feature_list=feature_schema_list
+    )
+    assert len(ref_feature_data) < feature_plan.output_length(len(data_vector))
+    for tail in (None, 1000, 5):
+        feature_output = feature_plan.run(data_vector=data_vector, tail=tail)
+        expected_feature_data = ref_feature_data[
+            len(ref_feature_data) - (tail or len(ref_feature_data)) :
+        ]
+        assert np.array_equal(feature_output.feature_data, expected_feature_data)
+        assert (
+            feature_output.time_index
+            == data_vector.index[len(data_vector) - len(expected_feature_data) :]
+        ).all()
+
+
+def test_feature_preparation_in_thread_pool(
+    get_test_decending_then_ascending_mkt_data, get_price_feature_spec
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=200)["close"]
+    feature_schema_list = get_price_feature_spec + [
+        Feature_Definition(
+            meta={"name": Feature_Enum.RSI},
+            data=RSI_Feature_Interface(rsi_window=7, dimension=LOOK_BACK),
+        ),
+        Feature_Definition(
+            meta={"name": Feature_Enum.SMA_CROSS},
+            data=SMA_Cross_Feature_Interface(
+                sma_window_1=5, sma_window_2=20, dimension=LOOK_BACK
+            ),
+        ),
+    ]
+
+    feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=one_vector_data, feature_schema_list=feature_schema_list
+    )
+    parallel_feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=one_vector_data,
+        feature_schema_list=feature_schema_list,
+        max_workers=4,
+    )
+    assert (feature_output.time_index == parallel_feature_output.time_index).all()
+    assert (feature_output.feature_data == parallel_feature_output.feature_data).all()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        executor_feature_output = create_feature_from_one_dim_data_v2(
+            data_vector=one_vector_data,
+            feature_schema_list=feature_schema_list,
+            executor=executor,
+        )
+    assert (feature_output.feature_data == executor_feature_output.feature_data).all()
+
+
+def test_indicator_cache_calculates_once_across_threads() -> None:
+    indicator_cache = Indicator_Cache()
+    price = np.arange(10.0)
+    calculate_count: list[int] = []
+
+    def calculate() -> float:
+        calculate_count.append(1)
+        return price.sum()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda _: indicator_cache.get_or_calculate(
+                    df_price=price, indicator="sum", params=(), calculate=calculate
+                ),
+                range(64),
+            )
+        )
+    assert results == [45.0] * 64
+    assert len(calculate_count) == 1
+
+
+def test_feature_plan(
+    get_test_decending_then_ascending_mkt_data, get_price_feature_spec
+) -> None:
+    candles = get_test_decending_then_ascending_mkt_data(dim=200)
+    feature_schema_list = get_price_feature_spec + [
+        Feature_Definition(
+            meta={"name": Feature_Enum.RSI},
+            data=RSI_Feature_Interface(rsi_window=7, dimension=LOOK_BACK),
+        ),
+    ]
+    feature_plan = Feature_Plan(feature_schema_list=feature_schema_list)
+
+    assert feature_plan.output_width == LOG_PRICE_LOOKBACK + 3 * LOOK_BACK
+    assert list(feature_plan.column_offsets) == [
+        0,
+        LOG_PRICE_LOOKBACK,
+        LOG_PRICE_LOOKBACK + LOOK_BACK,
+        LOG_PRICE_LOOKBACK + 2 * LOOK_BACK,
+        LOG_PRICE_LOOKBACK + 3 * LOOK_BACK,
+    ]
+    # sma cross of window 50 and dimension 3
+    assert feature_plan.warm_up_length == 50 - 1 + LOOK_BACK - 1
+    # up/down move is shared by both RSI
+    assert feature_plan.is_sharing_indicators
+    assert len(feature_plan.indicators) == 7
+
+    # the plan runs repeatedly on different data vectors
+    for backend in Indicator_Backend:
+        feature_plan = Feature_Plan(
+            feature_schema_list=feature_schema_list, backend=backend
+        )
+        for data_vector in (
+            candles["close"],
+            candles["volume"],
+            candles["close"][50:],
+        ):
+            feature_output = feature_plan.run(data_vector=data_vector)
+            # each feature built on its own, trimmed to the shortest feature
+            feature_array_list = [
+                _initialize_price_feature_instance(
+                    nt=f_def.data, price=data_vector, backend=backend
+                ).output_feature_array(normalize=True)
+                for f_def in feature_schema_list
+            ]
+            shortest_feature_length = min(len(f) for f in feature_array_list)
+            ref_feature_data = np.concatenate(
+                [f[len(f) - shortest_feature_length :] for f in feature_array_list],
+                axis=1,
+            )
+            assert len(feature_output.feature_data) == feature_plan.output_length(
+                len(data_vector)
+            )
+            assert (
+                feature_output.time_index
+                == data_vector.index[len(data_vector) - shortest_feature_length :]
+            ).all()
+            assert np.array_equal(
+                feature_output.feature_data, ref_feature_data, equal_nan=True
+            )
+
+    with pytest.raises(NotImplementedError):
+        Feature_Plan(
+            feature_schema_list=[Feature_Definition(meta={}, data=(LOOK_BACK,))]
+        )
+
+
+@pytest.mark.parametrize("n", [1, 5])
+def test_feature_tail(
+    get_test_decending_then_ascending_mkt_data, get_price_feature_spec, n
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=2000)["close"]
+    feature_schema_list = get_price_feature_spec + [
+        Feature_Definition(
+            meta={"name": Feature_Enum.RSI},
+            data=RSI_Feature_Interface(rsi_window=7, dimension=LOOK_BACK),
+        ),
+    ]
+
+    for f_def in feature_schema_list:
+        feature = _initialize_price_feature_instance(
+            nt=f_def.data, price=one_vector_data
+        )
+        assert feature.tail_length(n) < len(one_vector_data)
+        feature_array = feature.output_feature_array(normalize=True)
+        feature_tail = feature.output_feature_tail(n=n, normalize=True)
+        assert feature_tail.shape == (n, feature.dimension)
+        # RSI over the tail is the same up to float64 precision
+        assert np.allclose(feature_tail, feature_array[-n:], rtol=1e-12, atol=0)
+
+    feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=one_vector_data, feature_schema_list=feature_schema_list
+    )
+    tail_feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=one_vector_data, feature_schema_list=feature_schema_list, tail=n
+    )
+    assert (tail_feature_output.time_index == feature_output.time_index[-n:]).all()
+    assert np.allclose(
+        tail_feature_output.feature_data,
+        feature_output.feature_data[-n:],
+        rtol=1e-12,
+        atol=0,
+    )
+
+
+def test_feature_preparation_batch(
+    get_test_decending_then_ascending_mkt_data, get_price_feature_spec
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=400)["close"]
+    scenario_length = 200
+    data_vector_list = [
+        one_vector_data.iloc[i : i + scenario_length] for i in range(0, 200, 25)
+    ]
+    data_matrix = np.stack([data_vector.values for data_vector in data_vector_list])
+
+    feature_tensor = create_feature_from_two_dim_data(
+        data_matrix=data_matrix, feature_schema_list=get_price_feature_spec
+    )
+    assert feature_tensor.shape[0] == len(data_vector_list)
+    for data_vector, feature_data in zip(data_vector_list, feature_tensor):
+        feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+            data_vector=data_vector,
+            feature_schema_list=get_price_feature_spec,
+            backend=Indicator_Backend.NUMPY,
+        )
+        assert feature_data.shape == feature_output.feature_data.shape
+        assert (feature_data == feature_output.feature_data).all()
+
+    with pytest.raises(ValueError):
+        create_feature_from_two_dim_data(
+            data_matrix=data_matrix[0], feature_schema_list=get_price_feature_spec
+        )
+
+
+def test_feature_preparation_by_time_range(
+    get_test_decending_then_ascending_mkt_data, get_price_feature_spec
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=400)["close"]
+    time_index = one_vector_data.index
+    # overlapping scenarios of 100 candles every 50 candles
+    time_ranges = [
+        (time_index[i], time_index[i + 99]) for i in range(0, 300, 50)
+    ]
+
+    feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=one_vector_data, feature_schema_list=get_price_feature_spec
+    )
+    warm_up_length = len(one_vector_data) - len(feature_output.feature_data)
+    scenario_output_list = create_feature_from_one_dim_data_by_time_range(
+        data_vector=one_vector_data,
+        feature_schema_list=get_price_feature_spec,
+        time_ranges=time_ranges,
+    )
+    assert len(scenario_output_list) == len(time_ranges)
+
+    # overlapping scenarios are views into the same feature data
+    assert np.shares_memory(
+        scenario_output_list[1].feature_data, scenario_output_list[2].feature_data
+    )
+    for (start, end), scenario_output in zip(time_ranges, scenario_output_list):
+        assert scenario_output.time_index[-1] == end
+        start_index = time_index.get_loc(start)
+        if start_index >= warm_up_length:
+            # warm-up from the preceding data, no row of the scenario is lost
+            assert scenario_output.time_index[0] == start
+            assert len(scenario_output.feature_data) == 100
+        else:
+            assert len(scenario_output.feature_data) == 100 - (
+                warm_up_length - start_index
+            )
+        start_row, end_row = feature_output.get_index_range(start, end)
+        assert (
+            scenario_output.feature_data
+            == feature_output.feature_data[start_row:end_row]
+        ).all()
+
+
+@pytest.mark.parametrize("backend", list(Indicator_Backend))
+@pytest.mark.parametrize("chunk_size", [1, 333, 5000])
+def test_feature_preparation_by_chunk(
+    get_test_decending_then_ascending_mkt_data,
+    get_price_feature_spec,
+    backend,
+    chunk_size,
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=3000)["close"]
+    if chunk_size == 1:
+        one_vector_data = one_vector_data.iloc[:600]
+    # RSI of short window runs over many blocks of its running sum
+    feature_schema_list = get_price_feature_spec + [
+        Feature_Definition(
+            meta={"name": Feature_Enum.RSI},
+            data=RSI_Feature_Interface(rsi_window=2, dimension=LOOK_BACK),
+        ),
+    ]
+
+    feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=one_vector_data,
+        feature_schema_list=feature_schema_list,
+        backend=backend,
+    )
+    chunk_output_list = list(
+        create_feature_from_one_dim_data_by_chunk(
+            data_vector=one_vector_data,
+            feature_schema_list=feature_schema_list,
+            chunk_size=chunk_size,
+            backend=backend,
+        )
+    )
+    assert all(len(f.feature_data) <= chunk_size for f in chunk_output_list)
+    chunk_feature_data = np.concatenate([f.feature_data for f in chunk_output_list])
+    chunk_time_index = np.concatenate([f.time_index for f in chunk_output_list])
+    # bit-identical to the single-shot calculation
+    assert (chunk_time_index == feature_output.time_index).all()
+    assert np.array_equal(chunk_feature_data, feature_output.feature_data)
+
+
+def test_feature_preparation_with_cache(
+    tmp_path, get_test_decending_then_ascending_mkt_data, get_price_feature_spec
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=300)["close"]
+    feature_cache = FeatureCacheStorage(
+        cache_folder=str(tmp_path / "feature_cache"), max_size_bytes=10**8
+    )
+
+    feature_output: Feature_Output = create_feature_from_one_dim_data_with_cache(
+        data_vector=one_vector_data,
+        feature_schema_list=get_price_feature_spec,
+        feature_cache=feature_cache,
+    )
+    key = get_feature_cache_key(
+        data_vector=one_vector_data, feature_schema_list=get_price_feature_spec
+    )
+    assert feature_cache.load(key) is not None
+
+    # second call loads the cached feature data
+    cached_output: Feature_Output = create_feature_from_one_dim_data_with_cache(
+        data_vector=one_vector_data,
+        feature_schema_list=get_price_feature_spec,
+        feature_cache=feature_cache,
+    )
+    assert isinstance(cached_output.feature_data, np.memmap)
+    assert np.array_equal(cached_output.feature_data, feature_output.feature_data)
+    assert (cached_output.time_index == feature_output.time_index).all()
+
+    # any change of data, schema, backend or dtype changes the key
+    other_keys = [
+        get_feature_cache_key(one_vector_data * 1.01, get_price_feature_spec),
+        get_feature_cache_key(one_vector_data, get_price_feature_spec[:-1]),
+        get_feature_cache_key(
+            one_vector_data, get_price_feature_spec, backend=Indicator_Backend.NUMPY
+        ),
+        get_feature_cache_key(one_vector_data, get_price_feature_spec, dtype="float32"),
+    ]
+    assert len(set(other_keys + [key])) == len(other_keys) + 1
+
+    # least recently used entries are evicted beyond the size bound
+    entry_size = feature_cache.size_bytes
+    feature_cache.max_size_bytes = entry_size * 2
+    for i, other_key in enumerate(other_keys):
+        feature_cache.save(other_key, feature_output.feature_data + i)
+    assert feature_cache.size_bytes <= feature_cache.max_size_bytes
+    assert feature_cache.load(other_keys[-1]) is not None
+    assert feature_cache.load(key) is None
+
+
+def test_feature_output_save_and_load(
+    tmp_path, get_test_decending_then_ascending_mkt_data, get_price_feature_spec
+) -> None:
+    one_vector_data = get_test_decending_then_ascending_mkt_data(dim=300)["close"]
+    feature_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=one_vector_data,
+        feature_schema_list=get_price_feature_spec,
+        dtype=np.float32,
+    )
+    merged_output = Feature_Output.merge_feature_output_list(
+        [feature_output, feature_output]
+    )
+    tz_aware_output = Feature_Output(
+        metadata=feature_output.metadata,
+        time_index=feature_output.time_index.tz_localize("Asia/Hong_Kong"),
+        feature_data=feature_output.feature_data,
+    )
+
+    folder = str(tmp_path / "feature_output")
+    previous_outputs: list[tuple[Feature_Output, Feature_Output]] = []
+    for output in [feature_output, merged_output, tz_aware_output]:
+        output.save(folder)
+        loaded_output = Feature_Output.load(folder)
+        assert isinstance(loaded_output.feature_data, np.memmap)
+        assert loaded_output.dtype == output.dtype
+        assert np.array_equal(loaded_output.feature_data, output.feature_data)
+        assert loaded_output.time_index.equals(output.time_index)
+        assert loaded_output.metadata == output.metadata
+        # memory maps of the outputs saved before into the folder stay valid
+        for previous_output, previous_loaded_output in previous_outputs:
+            assert np.array_equal(
+                previous_loaded_output.feature_data, previous_output.feature_data
+            )
+        previous_outputs.append((output, loaded_output))
+    assert sorted(os.listdir(folder)) == sorted(
+        [
+            Feature_Output.FEATURE_DATA_FILENAME,
+            Feature_Output.TIME_INDEX_FILENAME,
+            Feature_Output.METADATA_FILENAME,
+        ]
+    )
+
+    loaded_output = Feature_Output.load(folder, mmap=False)
+    assert not isinstance(loaded_output.feature_data, np.memmap)
+
+
+def test_feature_merging_as_of(get_price_feature_spec) -> None:
+    time_index = pd.date_range("2023-01-01", periods=800, freq="15min")
+    close = pd.Series(
+        1000 + 100 * np.sin(np.arange(len(time_index)) / 20), index=time_index
+    )
+    fine_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=close, feature_schema_list=get_price_feature_spec
+    )
+    # hourly feature known at the close of the hour
+    hourly_close = close.resample("1h", label="right", closed="left").last()
+    coarse_output: Feature_Output = create_feature_from_one_dim_data_v2(
+        data_vector=hourly_close, feature_schema_list=get_price_feature_spec
+    )
+    fine_width = fine_output.feature_data.shape[1]
+
+    merged_output = Feature_Output.merge_feature_output_list(
+        [fine_output, coarse_output], alignment=Time_Alignment_Enum.BACKWARD
+    )
+    assert merged_output.time_index[0] == coarse_output.time_index[0]
+    assert merged_output.time_index.equals(
+        fine_output.time_index[-len(merged_output.time_index) :]
+    )
+    assert np.array_equal(
+        merged_output.feature_data[:, :fine_width],
+        fine_output.feature_data[-len(merged_output.time_index) :],
+    )
+    for i in [0, 1, 5, 333, len(merged_output.time_index) - 1]:
+        t = merged_output.time_index[i]
+        expected = coarse_output.feature_data[coarse_output.time_index <= t][-1]
+        assert np.array_equal(merged_output.feature_data[i, fine_width:], expected)
+
+    # exact alignment leaves NaN between the hours
+    merged_output = Feature_Output.merge_feature_output_list(
+        [fine_output, coarse_output], alignment=Time_Alignment_Enum.EXACT
+    )
+    is_on_hour = merged_output.time_index.minute == 0
+    assert not np.isnan(merged_output.feature_data[is_on_hour]).any()
+    assert np.isnan(merged_output.feature_data[~is_on_hour, fine_width:]).all()
+
+    # merging outputs of the same time index is the plain merge
+    merged_output = Feature_Output.merge_feature_output_list(
+        [fine_output, fine_output], alignment=Time_Alignment_Enum.EXACT
+    )
+    assert np.array_equal(
+        merged_output.feature_data,
+        Feature_Output.merge_feature_output_list(
+            [fine_output, fine_output]
+        ).feature_data,
+    )
+
+
+def test_feature_preparation_by_timeframe(get_price_feature_spec) -> None:
+    # starts and ends in the middle of a 4H candle
+    time_index = pd.date_range("2023-01-01 01:30", periods=3000, freq="15min")
+    close = pd.Series(
+        1000 + 100 * np.sin(np.arange(len(time_index)) / 30), index=time_index
+    )
+    feature_schema_by_timeframe = {
+        "15Min": get_price_feature_spec,
+        "1h": get_price_feature_spec,
+        "4h": get_price_feature_spec,
+    }
+    feature_output: Feature_Output = create_feature_from_one_dim_data_by_timeframe(
+        data_vector=close,
+        base_timeframe="15Min",
+        feature_schema_by_timeframe=feature_schema_by_timeframe,
+    )
+    assert feature_output.time_index.equals(
+        time_index[-len(feature_output.time_index) :]
+    )
+    assert not np.isnan(feature_output.feature_data).any()
+
+    width = feature_output.feature_data.shape[1] // 3
+    for i, timeframe in enumerate(["1h", "4h"], start=1):
+        # reference: resample the base price directly, keep closed candles only
+        candle_close = close.resample(timeframe, origin="epoch").last()
+        candle_close_time = candle_close.index + pd.Timedelta(timeframe)
+        base_timedelta = pd.Timedelta("15min")
+        candle_close = candle_close[candle_close_time <= time_index[-1] + base_timedelta]
+        # known at the last base candle of the candle
+        candle_close.index = candle_close_time[: len(candle_close)] - base_timedelta
+        ref_output: Feature_Output = create_feature_from_one_dim_data_v2(
+            data_vector=candle_close, feature_schema_list=get_price_feature_spec
+        )
+        for row in [0, 1, 7, 100, len(feature_output.time_index) - 1]:
+            t = feature_output.time_index[row]
+            # latest candle closed by the end of the base candle at t
+            ref_row = ref_output.time_index.searchsorted(t, side="right") - 1
+            assert np.array_equal(
+                feature_output.feature_data[row, i * width : (i + 1) * width],
+                ref_output.feature_data[ref_row],
+            )
@@ -109,3 +109,26 @@ def test_output_feature_array(get_test_ascending_mkt_data) -> None:
         if i == 0:
             break
     pass
+
+
+def test_look_back_feature_view() -> None:
+    raw_data = np.arange(10, dtype=np.float64)
+    dummy_feature = DummyFeature()
+    feature_copy = dummy_feature.create_feature_from_raw_data_array(
+        raw_data_array=raw_data, look_back=LOOK_BACK
+    )
+    feature_view = dummy_feature.create_feature_from_raw_data_array(
+        raw_data_array=raw_data, look_back=LOOK_BACK, as_view=True
+    )
+    assert (feature_view == feature_copy).all()
+    assert np.shares_memory(feature_view, raw_data)
+    assert not feature_view.flags.writeable
+
+
+def test_output_feature_array_view(get_test_ascending_mkt_data) -> None:
+    df = get_test_ascending_mkt_data(dim=20)
+    log_price_move = Log_Price_Feature(df["close"], LOOK_BACK)
+    feature_array = log_price_move.output_feature_array(normalize=True)
+    feature_view = log_price_move.output_feature_array(normalize=True, as_view=True)
+    assert feature_view.shape == feature_array.shape
+    assert (feature_view == feature_array).all()
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from crypto_feature_preprocess.domains.features_gen import RSI_Feature
-from crypto_feature_preprocess.domains.indicators import calculate_rsi
+from crypto_feature_preprocess.domains.indicators import calculate_rsi, calculate_rsi_bank
 
 import numpy as np
 import pytest
@@ -26,6 +26,25 @@ def test_rsi_indicator(get_test_decending_then_ascending_mkt_data) -> None:
     pass
 
 
+def test_rsi_bank(get_test_decending_then_ascending_mkt_data) -> None:
+    mktdata_close = get_test_decending_then_ascending_mkt_data(dim=500)["close"]
+    mktdata_close = mktdata_close * np.exp(np.sin(np.arange(len(mktdata_close))) / 50)
+    rsi_windows = [1, 2, 7, 14, 100, 600]
+    rsi_bank = calculate_rsi_bank(mktdata_close, windows=rsi_windows)
+    assert rsi_bank.shape == (len(rsi_windows), len(mktdata_close))
+    for rsi_window, rsi in zip(rsi_windows, rsi_bank):
+        ref_rsi = calculate_rsi(df_price=mktdata_close, window=rsi_window)
+        assert (np.isnan(rsi) == ref_rsi.isna().values).all()
+        assert np.allclose(rsi, ref_rsi.values, rtol=1e-12, equal_nan=True)
+
+    # NaN in the middle of the price series
+    mktdata_close.iloc[250] = np.nan
+    rsi_bank = calculate_rsi_bank(mktdata_close.values, windows=rsi_windows)
+    for rsi_window, rsi in zip(rsi_windows, rsi_bank):
+        ref_rsi = calculate_rsi(df_price=mktdata_close, window=rsi_window)
+        assert np.allclose(rsi, ref_rsi.values, rtol=1e-12, equal_nan=True)
+
+
 def test_rsi_feature(get_test_decending_then_ascending_mkt_data) -> None:
     dim: int = 20
     rsi_window: int = 14